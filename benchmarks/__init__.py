@@ -0,0 +1,10 @@
+from .simulatorBenchmarks import throughput, scenarioGeneration, scaling, stores, rollout, evaluation
+
+__all__ = [
+    "throughput",
+    "scenarioGeneration",
+    "scaling",
+    "stores",
+    "rollout",
+    "evaluation"
+]
\ No newline at end of file
@@ -0,0 +1,174 @@
+"""
+Benchmarks of the simulator: throughput of DailySimulation, scenario generation, scaling with shelf life and lead time
+and with the number of stores under the depot, cost of the rollout decisions and of a policy evaluation. Each benchmark returns a list of JSON-serializable records.
+"""
+import time
+import numpy as np
+from envs import loadConfiguration, buildSimulation, multiStoreSetting
+from managers import ScenarioGenerationCorr, ScenarioGenerationMulti
+from policies import MultiRetailerDepotPolicy, RolloutPolicy
+from policies.policyFactory import policySpec, buildPolicy
+from optimization import PolicyEvaluator
+
+#policies of main_example per configuration (the multi-echelon ones with LIFO internal issuing)
+POLICIES = {'SingSourceInd': ['COP','BSP'], 'SingSourceDepot': ['FPL_l','SP_l','SC_l','FPC_l','FPL2K_l']}
+
+def _policy(store_setting: dict, producer: dict, flagDepot: bool, pol: str):
+    #example policy of main_example, parameters projected on the bounds of the setting
+    policyClass, setup, x = policySpec(pol, flagDepot)
+    policy = buildPolicy(policyClass, setup, store_setting, producer)
+    policy.setParameters(*policy.xToParams(np.clip(np.asarray(x, dtype = float), policy.lb, policy.ub)))
+    return policy, policyClass, setup, np.clip(np.asarray(x, dtype = float), policy.lb, policy.ub)
+
+def _run(env, policy, seed: int):
+    #days simulated and seconds of the steps (reset excluded)
+    env.setSeed('All', seed)
+    obs = env.reset()
+    done = False
+    start = time.perf_counter()
+    while not done:
+        obs, reward, done, _ = env.step(*policy.decide(obs))
+    return env.current_step, time.perf_counter() - start
+
+def throughput(confDir: str = './configurations', days: int = 7*2000, repeats: int = 3):
+    """
+    Simulated days per second of DailySimulation (test mode) for each configuration and policy of main_example
+    """
+    records = []
+    for conf,policies in POLICIES.items():
+        store_setting, producer, flagDepot = loadConfiguration(conf, confDir)
+        for pol in policies:
+            policy = _policy(store_setting, producer, flagDepot, pol)[0]
+            env = buildSimulation(store_setting, producer, flagDepot, days)
+            env.setTest()
+            times = [_run(env, policy, seed)[1] for seed in range(1, repeats + 1)]
+            records.append({'benchmark': 'throughput', 'conf': conf, 'policy': pol, 'days': env.current_step,
+                            'seconds': min(times), 'daysPerSecond': env.current_step/min(times)})
+    return records
+
+def scenarioGeneration(confDir: str = './configurations', horizons: list = [7*1000, 7*10000, 7*50000], repeats: int = 3, stores: list = [1, 10, 100]):
+    """
+    Seconds of ScenarioGenerationCorr.reset (full-horizon correlated demand of both channels) for growing horizons and
+    of ScenarioGenerationMulti.reset (OnLine and stores copies of the OffLine channel) for the longest horizon
+    """
+    records = []
+    for conf in POLICIES.keys():
+        store_setting = loadConfiguration(conf, confDir)[0]
+        on,off = store_setting['OnLine'], store_setting['OffLine']
+        generator = ScenarioGenerationCorr(on['Distr'], on['ev_Daily'], on['std_Daily'], off['Distr'], off['ev_Daily'], off['std_Daily'], -0.5)
+        generator.setSeed(1)
+        for timeHorizon in horizons:
+            times = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                generator.reset(timeHorizon)
+                times.append(time.perf_counter() - start)
+            records.append({'benchmark': 'scenario', 'conf': conf, 'days': timeHorizon,
+                            'seconds': min(times), 'daysPerSecond': timeHorizon/min(times)})
+    store_setting = loadConfiguration('SingSourceDepot', confDir)[0]
+    for nStores in stores:
+        channels = {'OnLine': store_setting['OnLine'], **{'OffLine_' + str(i): store_setting['OffLine'] for i in range(1, nStores + 1)}}
+        generator = ScenarioGenerationMulti(channels, ScenarioGenerationMulti.factorCorrelation(nStores, -0.5))
+        generator.setSeed(1)
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            generator.reset(horizons[-1])
+            times.append(time.perf_counter() - start)
+        records.append({'benchmark': 'scenarioMulti', 'conf': 'SingSourceDepot', 'stores': nStores, 'days': horizons[-1],
+                        'seconds': min(times), 'daysPerSecond': horizons[-1]/min(times)})
+    return records
+
+def scaling(confDir: str = './configurations', shelfLives: list = [5, 8, 12, 16], leadTimes: list = [1, 3, 5], days: int = 7*1000, repeats: int = 2):
+    """
+    Simulated days per second varying the shelf life (lead time of the producer) and the lead time (shelf life of the producer)
+    of the producer, with COP (SingSourceInd) and SC_l (SingSourceDepot)
+    """
+    records = []
+    for conf,pol in [('SingSourceInd','COP'), ('SingSourceDepot','SC_l')]:
+        store_setting, producer, flagDepot = loadConfiguration(conf, confDir)
+        grid = [(SL, producer['LT']) for SL in shelfLives] + [(producer['SL'], LT) for LT in leadTimes if LT != producer['LT']]
+        for SL,LT in grid:
+            setting = dict(producer, SL = SL, LT = LT)
+            if SL - LT - max([store_setting[k].get('RLT',0) for k in store_setting.keys()]) < 2:
+                continue #no shelf life left at the retailers
+            policy = _policy(store_setting, setting, flagDepot, pol)[0]
+            env = buildSimulation(store_setting, setting, flagDepot, days)
+            env.setTest()
+            times = [_run(env, policy, seed)[1] for seed in range(1, repeats + 1)]
+            records.append({'benchmark': 'scaling', 'conf': conf, 'policy': pol, 'SL': SL, 'LT': LT, 'days': env.current_step,
+                            'seconds': min(times), 'daysPerSecond': env.current_step/min(times)})
+    return records
+
+def stores(confDir: str = './configurations', counts: list = [1, 10, 50, 100, 200], rules: list = ['priority','proportional','fairShare'],
+           days: int = 7*500, repeats: int = 2):
+    """
+    Simulated days per second (decisions included) of SingSourceDepot with many copies of the offline store under the depot,
+    MultiRetailerDepotPolicy with the SP_l setup and each rationing rule (the depot orders 95% of the expected demand, thus it rations)
+    """
+    store_setting, producer, flagDepot = loadConfiguration('SingSourceDepot', confDir)
+    _,setup,x = policySpec('SP_l', flagDepot)
+    records = []
+    for nStores in counts:
+        setting = multiStoreSetting(store_setting, nStores)
+        env = buildSimulation(setting, producer, flagDepot, days)
+        env.setTest()
+        policy = buildPolicy(MultiRetailerDepotPolicy, setup, setting, producer)
+        demand = sum(setting[k]['ev_Daily'] for k in setting.keys())
+        params = np.clip(np.array([0.95*demand] + [x[1]]*nStores, dtype = float), policy.lb, policy.ub)
+        policy.setParameters(*policy.xToParams(params))
+        for rule in rules:
+            policy.setRationing(rule)
+            times = [_run(env, policy, seed)[1] for seed in range(1, repeats + 1)]
+            records.append({'benchmark': 'stores', 'conf': 'SingSourceDepot', 'policy': 'SP_l', 'stores': nStores, 'rationing': rule,
+                            'days': env.current_step, 'seconds': min(times), 'daysPerSecond': env.current_step/min(times),
+                            'storeDaysPerSecond': nStores*env.current_step/min(times)})
+    return records
+
+def rollout(confDir: str = './configurations', samples: list = [8, 32, 128], days: int = 7*50, seed: int = 1):
+    """
+    Milliseconds per decision of RolloutPolicy (default candidates, horizon of a week) on the example policies SC_l and COP
+    for growing numbers of demand futures, with the average daily profit of the rollout and of its base policy (test mode)
+    """
+    records = []
+    for conf,pol in [('SingSourceDepot','SC_l'), ('SingSourceInd','COP')]:
+        store_setting, producer, flagDepot = loadConfiguration(conf, confDir)
+        base = _policy(store_setting, producer, flagDepot, pol)[0]
+        env = buildSimulation(store_setting, producer, flagDepot, days)
+        env.setTest()
+        _run(env, base, seed)
+        baseProfit = env.statMgr.getAverageProfit()
+        for nSamples in samples:
+            policy = RolloutPolicy(base, env, nSamples = nSamples)
+            env.setSeed('All', seed)
+            obs = env.reset()
+            done = False
+            seconds = 0
+            while not done:
+                start = time.perf_counter()
+                decision = policy.decide(obs)
+                seconds += time.perf_counter() - start
+                obs, reward, done, _ = env.step(*decision)
+            records.append({'benchmark': 'rollout', 'conf': conf, 'policy': pol, 'samples': nSamples, 'candidates': policy.nCandidates,
+                            'days': env.current_step, 'seconds': seconds, 'msPerDecision': 1e3*seconds/env.current_step,
+                            'profit': env.statMgr.getAverageProfit(), 'baseProfit': baseProfit})
+    return records
+
+def evaluation(confDir: str = './configurations', timeHorizon: int = 7*10000, seeds: list = [1]):
+    """
+    End-to-end seconds of a PolicyEvaluator evaluation (learn mode, stopping rule included) of each policy of main_example,
+    from a warm evaluator (environment and policy already built)
+    """
+    records = []
+    for conf,policies in POLICIES.items():
+        store_setting, producer, flagDepot = loadConfiguration(conf, confDir)
+        for pol in policies:
+            _,policyClass,setup,x = _policy(store_setting, producer, flagDepot, pol)
+            with PolicyEvaluator(store_setting, producer, flagDepot, policyClass, setup, seeds = seeds, timeHorizon = timeHorizon) as evaluator:
+                evaluator.evaluate([x]) #warm-up (scenarios of the seeds)
+                start = time.perf_counter()
+                result = evaluator.evaluate([x])
+                seconds = time.perf_counter() - start
+            records.append({'benchmark': 'evaluation', 'conf': conf, 'policy': pol, 'seeds': len(seeds), 'steps': float(result['steps'][0]),
+                            'profit': float(result['profit'][0]), 'seconds': seconds})
+    return records
@@ -0,0 +1,62 @@
+"""
+Command line tool checking the closed-form issuing kernel (managers.InventoryManager.issueStock) against the former
+age-by-age LIFO/FIFO loops, kept here as reference: sales and remaining stock must be bit-identical on random integer
+inventories, both for single inventories and for batches, e.g.,
+
+python check_issuing.py --trials 20000
+"""
+
+from managers.InventoryManager import issueStock
+import argparse
+import sys
+import numpy as np
+
+def meetDemandLoop(inventory, howmany, lifo):
+    #reference: the loops of InventoryManager.meetDemandLifo/meetDemandFifo before the kernel
+    shelfLife = len(inventory)
+    Sales = max(0,np.min([howmany,np.sum(inventory)]))
+    toSell = Sales
+    for age in range(shelfLife):
+        i = shelfLife - age - 1 if lifo else age
+        disp = inventory[i]
+        inventory[i] -= max(0,np.min([toSell,disp]))
+        toSell -= max(0,np.min([toSell,disp]))
+    return Sales
+
+def check(trials: int, seed: int):
+    #number of mismatching (single, batched) comparisons
+    rng = np.random.default_rng(seed)
+    mismatches = [0, 0]
+    for _ in range(trials):
+        SL = int(rng.integers(1,20))
+        inventory = rng.integers(0,100,SL).astype(float)
+        howmany = float(rng.integers(0,int(inventory.sum()) + 50))
+        lifo = bool(rng.integers(2))
+        reference = inventory.copy()
+        referenceSales = meetDemandLoop(reference, howmany, lifo)
+        kernel = inventory.copy()
+        sales = issueStock(kernel, howmany, lifo)
+        if sales != referenceSales or not np.array_equal(kernel, reference):
+            mismatches[0] += 1
+    for _ in range(max(trials//100,1)):
+        SL = int(rng.integers(1,20))
+        N = int(rng.integers(1,200))
+        inventory = rng.integers(0,100,(N,SL)).astype(float)
+        howmany = rng.integers(0,200,N).astype(float)
+        lifo = bool(rng.integers(2))
+        reference = inventory.copy()
+        referenceSales = np.array([meetDemandLoop(reference[i], howmany[i], lifo) for i in range(N)])
+        sales = issueStock(inventory, howmany, lifo)
+        if not np.array_equal(sales, referenceSales) or not np.array_equal(inventory, reference):
+            mismatches[1] += 1
+    return mismatches
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check of the issuing kernel against the reference loops.')
+    parser.add_argument('--trials', type = int, default = 20000)
+    parser.add_argument('--seed', type = int, default = 0)
+    args = parser.parse_args()
+    single, batched = check(args.trials, args.seed)
+    print('single inventories:', args.trials - single, 'of', args.trials, 'identical')
+    print('batches:', max(args.trials//100,1) - batched, 'of', max(args.trials//100,1), 'identical')
+    sys.exit(1 if single + batched > 0 else 0)
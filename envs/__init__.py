@@ -1,3 +1,8 @@
 from .dailySimulation import DailySimulation
+from .batchDailySimulation import BatchDailySimulation
+from .simulationFactory import loadConfiguration, buildSimulation, multiStoreSetting
+from .observationBuffer import ObservationBuffer
+from .flatDailySimulation import FlatLayout, FlatDailySimulation, FlatBatchSimulation
+from .phaseProfiler import PhaseProfiler
 
-__all__ = [ "DailySimulation" ]
\ No newline at end of file
+__all__ = [ "DailySimulation", "BatchDailySimulation", "loadConfiguration", "buildSimulation", "multiStoreSetting", "ObservationBuffer", "FlatLayout", "FlatDailySimulation", "FlatBatchSimulation", "PhaseProfiler" ]
\ No newline at end of file
@@ -0,0 +1,291 @@
+import numpy as np
+from managers.InventoryManager import issueStock
+from managers.ScenarioStore import replayScenario
+
+class BatchDailySimulation():
+    '''
+    Batched counterpart of DailySimulation. It moves N replications (or N parameter vectors on the same scenario)
+    forward in lockstep, storing inventories, pipelines and statistics as arrays with a leading batch axis.
+    Each day receive / LIFO-FIFO sell / age / scrap runs as array operations across the whole batch.
+
+    The managers (retailers, depot and statManager) are only read to configure the batch (shelf lives, lead times, prices,
+    costs, LIFO settings, scenario generator and the accounting window); their internal state is not touched by step.
+
+    The observation has the same keys of DailySimulation with an additional leading batch axis, i.e.,
+        obs['Depot'] = {'inventory': (N,SL), 'ordered': (N,LT,SL)}
+        obs[k] = {'inventory': (N,SL_k), 'dispatched': (N,RLT_k,SL_k)}
+    The action is an orderSize array (N,SL) and a dispatched dict of (N,SL_k) arrays.
+
+    With the same seed, the per-replication profit, waste and unmet demand are identical to the ones of the scalar
+    RetailManager/DepotManager path simulated on the full horizon (setTest).
+    '''
+    def __init__(self,retailers,depot,statMgr,timeHorizon,nBatch):
+        #managers of the simulation (configuration only)
+        self.retailers = retailers
+        self.depot = depot #None if there is no depot
+        self.statMgr = statMgr
+        self.timeHorizon = timeHorizon
+        self.nBatch = nBatch
+        self.statMgr.setTimeHorizon(self.timeHorizon)
+        #nodes in the same order the scalar simulation steps them (depot first)
+        self.nodes = {}
+        if self.depot != None:
+            self.nodes['Depot'] = _BatchNode(self.depot,'OnLine',self.depot.cost_dep,nBatch)
+        for k in self.retailers.keys():
+            #without depot, retailers pay their orders
+            self.nodes[k] = _BatchNode(self.retailers[k],k,0 if self.depot != None else self.retailers[k].cost,nBatch)
+        #step
+        self.current_step = 0
+        self.clearStatistics()
+        #shared scenarios
+        self.scenarioStore = None
+
+    #####
+    def setScenarios(self,demand: dict, lifo: dict):
+        """
+        Demand and LIFO clients of each node (keys as self.nodes) as (N,timeHorizon) arrays.
+        A (1,timeHorizon) array is broadcast to the whole batch (common random numbers).
+        """
+        for k in self.nodes.keys():
+            self.nodes[k].demand = np.broadcast_to(demand[k],(self.nBatch,self.timeHorizon))
+            self.nodes[k].lifo = np.broadcast_to(lifo[k],(self.nBatch,self.timeHorizon))
+
+    def setScenarioStore(self,scenarioStore):
+        """
+        ScenarioStore serving the scenarios of the seeds passed to reset. None to replay them at each reset.
+        """
+        self.scenarioStore = scenarioStore
+
+    def reset(self,seeds = None):
+        """
+        seeds: list of N seeds (one per replication). Repeated seeds are generated once (or served by the ScenarioStore).
+        If None, the scenarios set by setScenarios are employed.
+        """
+        if seeds is not None:
+            if len(seeds) != self.nBatch:
+                raise ValueError('A seed per replication is required.')
+            unique,inverse = np.unique(np.array(seeds),return_inverse = True)
+            demand = {k: np.zeros((len(unique),self.timeHorizon)) for k in self.nodes.keys()}
+            lifo = {k: np.zeros((len(unique),self.timeHorizon)) for k in self.nodes.keys()}
+            for i,s in enumerate(unique):
+                if self.scenarioStore != None:
+                    bank = self.scenarioStore.getBank(self.retailers,self.depot,self.timeHorizon,int(s))
+                    for k in self.nodes.keys():
+                        demand[k][i] = bank[k]['demand']
+                        lifo[k][i] = bank[k]['lifo']
+                else:
+                    d,l = replayScenario(self.retailers,self.depot,self.timeHorizon,int(s))
+                    for k in self.nodes.keys():
+                        demand[k][i] = d[k]
+                        lifo[k][i] = l[k]
+            self.setScenarios({k: demand[k][inverse] for k in demand.keys()},{k: lifo[k][inverse] for k in lifo.keys()})
+        self.current_step = 0
+        for k in self.nodes.keys():
+            self.nodes[k].clearState()
+        self.clearStatistics()
+        return self.observe()
+
+    def setState(self,obs,step: int = 0):
+        """
+        It forks a state into the replications, e.g., the observation of a running DailySimulation (broadcast to all of them)
+        or a batched one (one state per replication): inventories and pipelines are set and statistics are cleared.
+        The next step is step + 1, the scenarios of the following days are the ones of setScenarios.
+        """
+        self.current_step = step
+        for k in self.nodes.keys():
+            node = self.nodes[k]
+            node.inv[:] = obs[k]['inventory']
+            node.pipe[:] = 0
+            if node.LT > 0:
+                node.pipe[:,:node.LT] = np.reshape(obs[k]['ordered' if k == 'Depot' else 'dispatched'],(-1,node.LT,node.SL))
+        self.clearStatistics()
+        return self.observe()
+
+    def clearStatistics(self):
+        self.n = 0
+        self.TotalCost = np.zeros(self.nBatch)
+        for k in self.nodes.keys():
+            self.nodes[k].clearStatistics()
+
+    def selectReplications(self,index):
+        """
+        It keeps only the replications in index (e.g., the candidates still racing) with their state, scenarios and statistics,
+        thus the next steps only simulate them.
+        """
+        index = np.asarray(index,dtype = int)
+        self.nBatch = len(index)
+        self.TotalCost = self.TotalCost[index]
+        for k in self.nodes.keys():
+            self.nodes[k].select(index)
+
+    #####
+    def step(self, orderSize: np.array, dispatched: dict):
+        #new step
+        self.current_step += 1
+        t = self.current_step
+        inWindow = (t >= self.statMgr.FirstTimeBucket) and (t <= self.statMgr.LastTimeBucket)
+        cost = np.zeros(self.nBatch)
+        ### depot action, starts in the evening ends in the morning
+        if self.depot != None:
+            depot = self.nodes['Depot']
+            depot.receive(orderSize)
+            cost = depot.cost*np.sum(orderSize,axis = 1)
+            #we dispatch
+            for k in self.retailers.keys():
+                rlt = self.nodes[k].manager.supManager.LeadTime
+                depot.inv[:,rlt:] -= dispatched[k]
+            if np.any(depot.inv < 0):
+                raise ValueError("The customer cannot buy something missing")
+            depot.sell(t)
+        # The stores open, receive the items and the day goes on until the end of the day inventory check
+        for k in self.retailers.keys():
+            self.nodes[k].receive(dispatched[k])
+            self.nodes[k].sell(t)
+        #statistics
+        if inWindow:
+            self.n += 1
+            if self.depot != None:
+                self.TotalCost += cost
+            else:
+                cost = np.zeros(self.nBatch)
+                for k in self.statMgr.ret_list:
+                    dayCost = self.nodes[k].cost*np.sum(dispatched[k],axis = 1)
+                    self.TotalCost += dayCost
+                    cost += dayCost
+            dayProfits = np.zeros(self.nBatch)
+            for k in self.statMgr.ret_list:
+                node = self._statNode(k)
+                node.updateStatistics()
+                dayProfits += node.profit
+            reward = dayProfits - cost
+        else:
+            reward = np.zeros(self.nBatch)
+        done = (self.current_step >= self.timeHorizon - 1)
+        return self.observe(),reward,done,{}
+
+    def observe(self):
+        obs = {}
+        for k in self.nodes.keys():
+            node = self.nodes[k]
+            if k == 'Depot':
+                obs[k] = {'inventory': node.inv.copy(), 'ordered': node.pipe[:,:node.LT].copy()}
+            else:
+                obs[k] = {'inventory': node.inv.copy(), 'dispatched': node.pipe[:,:node.LT].copy()}
+        return obs
+
+    def splitObs(self,obs,i):
+        """
+        Observation of the i-th replication in the format of DailySimulation (e.g., to feed scalar policies)
+        """
+        single = {}
+        for k in obs.keys():
+            single[k] = {}
+            for key in obs[k].keys():
+                value = obs[k][key][i]
+                if key != 'inventory':
+                    #with one period lead time the scalar observation is flat, without lead time it is empty
+                    if value.shape[0] == 1:
+                        value = value[0]
+                    elif value.shape[0] == 0:
+                        value = []
+                single[k][key] = value
+        return single
+
+    def _statNode(self,name):
+        #the depot is the OnLine retailer in statistics
+        if self.depot != None and name == 'OnLine':
+            return self.nodes['Depot']
+        return self.nodes[name]
+
+    #Metrics of the simulation, one value per replication
+    def getAverageProfit(self):
+        revenue = np.zeros(self.nBatch)
+        for k in self.statMgr.ret_list:
+            revenue += self._statNode(k).TotalProfit
+        return (revenue - self.TotalCost) / self.n
+    def getAverageScrapped(self):
+        totScrapped = np.zeros(self.nBatch)
+        for k in self.statMgr.ret_list:
+            totScrapped += self._statNode(k).TotalScrapped
+        return totScrapped / self.n
+    def getAverageUnmetClients(self):
+        totLostCum = np.zeros(self.nBatch)
+        for k in self.statMgr.ret_list:
+            totLostCum += self._statNode(k).totLost
+        return totLostCum / self.n
+    def getStockOutProb(self,retailName):
+        return self._statNode(retailName).nStockOut / self.n
+
+
+class _BatchNode():
+    """
+    Batched state of a retailer (or of the depot): age-based inventory, pipeline of orders and daily outcomes.
+    """
+    def __init__(self,manager,statName,cost,nBatch):
+        self.manager = manager
+        self.statName = statName
+        self.SL = manager.invManager.ShelfLife
+        self.LT = manager.supManager.LeadTime
+        self.prices = manager.prices
+        self.markdowns = manager.markdowns
+        self.cost = cost
+        self.nBatch = nBatch
+        self.demand = None
+        self.lifo = None
+        self.clearState()
+        self.clearStatistics()
+
+    def clearState(self):
+        self.inv = np.zeros((self.nBatch,self.SL))
+        self.pipe = np.zeros((self.nBatch,self.LT+1,self.SL))
+
+    def clearStatistics(self):
+        self.TotalSold = np.zeros(self.nBatch)
+        self.TotalScrapped = np.zeros(self.nBatch)
+        self.TotalProfit = np.zeros(self.nBatch)
+        self.totLost = np.zeros(self.nBatch)
+        self.nStockOut = np.zeros(self.nBatch)
+
+    def select(self,index):
+        #state, scenarios and statistics of the replications in index
+        self.nBatch = len(index)
+        self.inv = self.inv[index]
+        self.pipe = self.pipe[index]
+        if self.demand is not None:
+            self.demand = self.demand[index]
+            self.lifo = self.lifo[index]
+        self.TotalSold = self.TotalSold[index]
+        self.TotalScrapped = self.TotalScrapped[index]
+        self.TotalProfit = self.TotalProfit[index]
+        self.totLost = self.totLost[index]
+        self.nStockOut = self.nStockOut[index]
+
+    def receive(self,orderSize):
+        #order, delivery of the first slot and shift of the pipeline
+        self.pipe[:,-1] = orderSize
+        self.inv += self.pipe[:,0]
+        self.pipe[:,:-1] = self.pipe[:,1:]
+        self.pipe[:,-1] = 0
+
+    def sell(self,t):
+        demand = np.rint(self.demand[:,t])
+        lifoC = self.lifo[:,t]
+        fifoC = demand - lifoC
+        #first lifo then fifo
+        lifoSold = issueStock(self.inv,lifoC,lifo = True)
+        fifoSold = issueStock(self.inv,fifoC,lifo = False)
+        self.lost = lifoC + fifoC - lifoSold - fifoSold
+        self.sales = lifoSold + fifoSold
+        #the store closes, ageing and scrap
+        self.scrapped = self.inv[:,0].copy()
+        self.inv[:,:-1] = self.inv[:,1:]
+        self.inv[:,-1] = 0
+        self.profit = self.prices*self.sales + self.markdowns*self.scrapped
+
+    def updateStatistics(self):
+        self.TotalSold += self.sales
+        self.TotalScrapped += self.scrapped
+        self.TotalProfit += self.profit
+        self.totLost += self.lost
+        self.nStockOut += (self.lost > 0)
+
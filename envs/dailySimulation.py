@@ -1,5 +1,7 @@
 import gym
 import numpy as np
+from managers.TraceManager import TraceManager
+from .observationBuffer import ObservationBuffer
 
 class DailySimulation(gym.Env):
     '''
@@ -25,27 +27,47 @@ class DailySimulation(gym.Env):
         self.statMgr = statMgr
         self.learn = True
         self.statMgr.setTimeHorizon(self.timeHorizon) #set time horizon
-        #debug print recursively activated
+        #debug trace (None = no trace), flagPrint prints each day as it ends
+        self.trace = None
         self.flagPrint = flagPrint
         if self.flagPrint:
-            for k in self.retailers.keys():
-                self.retailers.get(k).setFlagPrint(True)
-            if self.depot != None:
-                self.depot.setFlagPrint(True)
+            self.setTrace(TraceManager(echo = True))
         #step
         self.current_step = 0
+        #shared scenarios (None = each reset generates its own)
+        self.scenarioStore = None
+        #preallocated observation (None = a new observation dict per step)
+        self.obsBuffer = None
+        #phase profiler (None = no profiling)
+        self.profiler = None
 
     def reset(self):
         self.current_step = 0
+        #scenarios served by the store
+        if self.scenarioStore != None:
+            bank = self.scenarioStore.getBank(self.retailers,self.depot,self.timeHorizon)
+            for k in self.retailers.keys():
+                self.retailers.get(k).setScenarioBank(bank[k])
+            if self.depot != None:
+                self.depot.setScenarioBank(bank['Depot'])
         #dictionary obs
         obs = {}
+        if self.scenarioStore == None:
+            #new scenarios: the flags are cleared before any retailer reset, thus a generator shared by the retailers (and the depot)
+            #is drawn once per reset. Clearing it per retailer redrew it at each retailer: the seeded scenarios were the same,
+            #but without a seed the channels came from different draws and lost their correlation.
+            for k in self.retailers.keys():
+                self.retailers.get(k).scenarioMgr.generated = False
         for k in self.retailers.keys():
-            self.retailers.get(k).scenarioMgr.generated = False
             obs[k],_,_,_,_ = self.retailers.get(k).reset()
         if self.depot != None:
             obs['Depot'],_,_,_,_,_ = self.depot.reset()
         #stats clear            
         self.statMgr.clearStatistics()
+        if self.trace != None:
+            self.trace.clear()
+        if self.obsBuffer != None:
+            return self.obsBuffer
         return obs
 
     def step(self, orderSize: np.array ,dispatched: dict):
@@ -53,6 +75,8 @@ class DailySimulation(gym.Env):
         self.current_step += 1
         #update clock of the stats
         self.statMgr.updateClock()
+        if self.trace != None:
+            self.trace.setDay(self.current_step)
         ### depot action, starts in the evening ends in the morning
         obs = {}
         if self.depot != None:    
@@ -73,40 +97,154 @@ class DailySimulation(gym.Env):
             reward = self.statMgr.updateStatsDepot(cost)
         else:
             reward = self.statMgr.updateStatsDepot() #Dummy when there is no depot, it only computes the reward
-        #Debug prints
-        if self.flagPrint: 
-            print( 'CashFlow of the day ', reward)
-            print( 'State observation: ', obs)
+        #Debug trace
+        if self.trace != None:
+            self.trace.endDay(reward)
         #done? either MaxNumber or convergence
         done = False
         if self.learn:
             done = ( (self.current_step >= self.timeHorizon - 1) or self.statMgr.checkIfDone())
         else:
             done = (self.current_step >= self.timeHorizon - 1)
-        if done and self.flagPrint:
-            print('Simulation metrics:\n\tAverage Profit = ',self.getAverageProfit(),'\n\tAverage Waste = ',self.getAverageScrapped(),'\n\tAverage Unmet = ', self.getAverageUnmetClients(),'\n\tNumber of simulated weeks = ', self.statMgr.n/7)
+        if done and self.trace != None:
+            metrics = {'Average Profit': self.getAverageProfit(), 'Average Waste': self.getAverageScrapped(), 'Average Unmet': self.getAverageUnmetClients(),
+                       'Number of simulated weeks': self.statMgr.n/7}
             for k in self.retailers.keys():
-                print('stockout probability retailer: ',k,' = ',self.statMgr.getStockOutProb(k))
+                metrics['stockout probability retailer ' + k] = self.statMgr.getStockOutProb(k)
             if self.depot != None:
-                print('stockout probability retailer: OnLine(Depot) = ',self.statMgr.getStockOutProb('OnLine'))
+                metrics['stockout probability retailer OnLine(Depot)'] = self.statMgr.getStockOutProb('OnLine')
+            self.trace.setMetrics(metrics)
+        if self.obsBuffer != None:
+            return self.obsBuffer,reward,done,{}
         return obs,reward,done,{}
 
+    #managers and statistics whose state is packed by snapshot, in order
+    def _stateParts(self):
+        parts = [self.statMgr]
+        if self.depot != None:
+            parts.append(self.depot)
+        for k in self.retailers.keys():
+            parts.append(self.retailers[k])
+        return parts
+
+    def getStateSize(self):
+        #step, global random generator (flag, MT19937 key, position, cached gaussian) and the parts
+        return 1 + 628 + sum(part.getStateSize() for part in self._stateParts())
+
+    def snapshot(self, out: np.array = None, rng: bool = None):
+        """
+        Full state of the running simulation (after reset) packed in one contiguous float vector, written in out if given
+        (e.g., the preallocated buffers of a pool of forks): current step, state of the global random generator (LIFO clients),
+        inventories and pipelines of the managers, their totals and the accumulators of the StatManager (tracker and batch means included).
+        restore continues the run exactly as from the snapshot.
+        rng: whether the state of the generator is saved (and then restored). By default only if the steps draw the LIFO clients
+        (no ScenarioStore), since copying it is most of the cost of a snapshot.
+        The scenarios and the settings are not part of the state. The order histories of the managers and the histories of the
+        StatManager are append-only logs truncated by restore to their length at the snapshot (exact when going back along
+        the same run, e.g., the forks of a lookahead).
+        """
+        if out is None:
+            out = np.zeros(self.getStateSize())
+        elif len(out) != self.getStateSize():
+            raise ValueError('The buffer does not match the state of the simulation.')
+        out[0] = self.current_step
+        if rng is None:
+            rng = any(part.scenarioBank is None for part in self._stateParts()[1:])
+        out[1] = rng
+        if rng:
+            _,key,pos,hasGauss,gauss = np.random.get_state()
+            out[2:626] = key
+            out[626:629] = [pos,hasGauss,gauss]
+        start = 629
+        for part in self._stateParts():
+            size = part.getStateSize()
+            part.saveState(out[start:start + size])
+            start += size
+        return out
+
+    def restore(self, state: np.array):
+        """
+        It restores a state of snapshot (of this simulation) and returns the observation, as reset.
+        """
+        if len(state) != self.getStateSize():
+            raise ValueError('The state does not match the simulation.')
+        self.current_step = int(state[0])
+        if state[1]:
+            np.random.set_state(('MT19937',state[2:626].astype(np.uint32),int(state[626]),int(state[627]),state[628].item()))
+        start = 629
+        for part in self._stateParts():
+            size = part.getStateSize()
+            part.loadState(state[start:start + size])
+            start += size
+        obs = {}
+        if self.depot != None:
+            obs['Depot'] = self.depot.getObservation()
+        for k in self.retailers.keys():
+            obs[k] = self.retailers[k].getObservation()
+        if self.obsBuffer != None:
+            return self.obsBuffer
+        return obs
+
     #set seed of the simulation
-    #  NOTICE THAT: this function is currently reduntat for a 2 retailers (Online/Offline) correlated setting.
-    #  as it updates multiple time the seed of a shared scenarioMgr,
-    #  however it was initlially developed for different (independent) scenarioMgrs for each retailer/depot.
-    #  #TODO: adapt to correlated scenario generation
+    #  The retailers and the depot share one correlated generator (ScenarioGenerationCorr, or ScenarioGenerationMulti
+    #  with many offline retailers), thus 'All' seeds it once and a retailer name seeds the shared generator as well.
     def setSeed(self,retailName: str = 'All' ,seed = None):
         if retailName == 'All':
-            for k in self.retailers.keys():
-                self.retailers[k].scenarioMgr.setSeed(seed)
-            if self.depot != None:  
-                self.depot.scenarioMgr.setSeed(seed)
+            generators = {id(self.retailers[k].scenarioMgr): self.retailers[k].scenarioMgr for k in self.retailers.keys()}
+            if self.depot != None:
+                generators[id(self.depot.scenarioMgr)] = self.depot.scenarioMgr
+            for scenarioMgr in generators.values():
+                scenarioMgr.setSeed(seed)
         elif self.depot != None and retailName == 'OnLine':
             self.depot.scenarioMgr.setSeed(seed)
         else:
             self.retailers[retailName].scenarioMgr.setSeed(seed)
     
+    #scenarios (demand and LIFO clients) served by a ScenarioStore, None to generate them at each reset
+    def setScenarioStore(self,scenarioStore):
+        self.scenarioStore = scenarioStore
+        if scenarioStore == None:
+            for k in self.retailers.keys():
+                self.retailers[k].setScenarioBank(None)
+            if self.depot != None:
+                self.depot.setScenarioBank(None)
+
+    #debug trace of the days (see managers.TraceManager), None to switch it off
+    def setTrace(self,trace = None):
+        self.trace = trace
+        for k in self.retailers.keys():
+            self.retailers[k].setTrace(trace)
+        if self.depot != None:
+            self.depot.setTrace(trace)
+
+    #wall-time per phase and node (see PhaseProfiler) of the simulation and of the policy, if given. None to switch it off
+    def setProfiler(self,profiler = None,policy = None):
+        if self.profiler != None:
+            self.profiler.detach()
+        self.profiler = profiler
+        if profiler != None:
+            profiler.attach(self,policy)
+
+    #per-day order history of the managers (it can be switched off for optimization runs)
+    def setRecordHistory(self,flag: bool):
+        for k in self.retailers.keys():
+            self.retailers[k].setRecordHistory(flag)
+        if self.depot != None:
+            self.depot.setRecordHistory(flag)
+
+    #observation mode: 'dict' (a new dict of arrays per step) or 'buffer' (ObservationBuffer, one flat vector filled in place)
+    def setObservationMode(self,mode: str = 'dict'):
+        if mode == 'buffer':
+            if self.obsBuffer == None:
+                self.obsBuffer = ObservationBuffer(self.retailers,self.depot)
+                self.obsBuffer.attach()
+        elif mode == 'dict':
+            if self.obsBuffer != None:
+                self.obsBuffer.detach()
+                self.obsBuffer = None
+        else:
+            raise ValueError('Observation mode not available.')
+
     #if Test, the entire horizon runs
     def setTest(self):
         self.learn = False
@@ -129,3 +267,5 @@ class DailySimulation(gym.Env):
         return self.statMgr.getAverageScrapped()
     def getAverageUnmetClients(self):
         return self.statMgr.getAverageUnmetClients()
+    def getStandardError(self):
+        return self.statMgr.getStandardError()
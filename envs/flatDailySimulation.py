@@ -0,0 +1,164 @@
+"""
+Flat (vector) observation and action spaces of the simulations for learning agents
+"""
+import numpy as np
+from gym import Env, spaces
+from gym.vector import VectorEnv
+from .observationBuffer import ObservationBuffer
+
+class FlatLayout:
+    """
+    Flat layouts of a configuration (retailers dict and depot, None if there is no depot).
+    Observation: the layout of ObservationBuffer, S_t = [DC_t | RT_t].
+    Action:
+        with depot: [order | dispatched_k for each retailer k], where order is the quantity ordered by the depot (the freshest items)
+                    and dispatched_k the (SL - RLT_k,) items dispatched to k per residual shelf life, as the policies' dispatched arrays
+        without depot: [order_k for each retailer k], the quantity ordered by each retailer (the freshest items)
+    Both encodeObs and decodeAction accept a single vector or a batch with a leading axis and write into preallocated arrays.
+    """
+    def __init__(self, retailers: dict, depot = None):
+        self.obsLayout = ObservationBuffer(retailers,depot).layout
+        self.obsSize = max([blocks[key][1] for blocks in self.obsLayout.values() for key in blocks.keys()] + [0])
+        self.retailers = list(retailers.keys())
+        self.depot = depot != None
+        #shelf lives and lead times
+        self.SL = {k: retailers[k].invManager.ShelfLife for k in self.retailers}
+        self.RLT = {k: retailers[k].supManager.LeadTime for k in self.retailers}
+        self.actionLayout = {}
+        if self.depot:
+            self.SL['Depot'] = depot.invManager.ShelfLife
+            self.LT = depot.supManager.LeadTime
+            self.actionLayout['order'] = (0,1)
+            size = 1
+            for k in self.retailers:
+                self.actionLayout[k] = (size,size + self.SL[k])
+                size += self.SL[k]
+        else:
+            for i,k in enumerate(self.retailers):
+                self.actionLayout[k] = (i,i + 1)
+            size = len(self.retailers)
+        self.actionSize = size
+
+    def observationSpace(self):
+        return spaces.Box(0, np.inf, shape = (self.obsSize,), dtype = np.float64)
+
+    def actionSpace(self):
+        return spaces.Box(0, np.inf, shape = (self.actionSize,), dtype = np.float64)
+
+    def newAction(self, nBatch: int = None):
+        #preallocated orderSize and dispatched dict (with a leading batch axis if nBatch is not None)
+        lead = () if nBatch is None else (nBatch,)
+        orderSize = np.zeros(lead + ((self.SL['Depot'],) if self.depot else (0,)))
+        dispatched = {k: np.zeros(lead + (self.SL[k],)) for k in self.retailers}
+        return orderSize,dispatched
+
+    def encodeObs(self, obs: dict, out: np.array = None):
+        """
+        Observation dict (of DailySimulation, or of BatchDailySimulation with a leading batch axis) to flat vector(s), written in out
+        """
+        batch = np.ndim(obs[self.retailers[0]]['inventory']) == 2
+        if out is None:
+            out = np.zeros(((len(obs[self.retailers[0]]['inventory']),) if batch else ()) + (self.obsSize,))
+        for name,blocks in self.obsLayout.items():
+            for key,(start,stop,shape) in blocks.items():
+                if stop > start:
+                    value = np.asarray(obs[name][key])
+                    out[...,start:stop] = value.reshape(len(value),-1) if batch else value.reshape(-1)
+        return out
+
+    def decodeAction(self, action: np.array, obsVector: np.array, orderSize: np.array, dispatched: dict):
+        """
+        Flat action(s) to the orderSize and dispatched arrays of the simulations (see newAction), written in place.
+        Quantities are rounded and non-negative; dispatches are served, retailer after retailer, up to the depot inventory available
+        once the next delivery arrives (from the observation obsVector), thus the decoded action is always feasible.
+        """
+        action = np.asarray(action)
+        if not self.depot:
+            for k in self.retailers:
+                start,stop = self.actionLayout[k]
+                dispatched[k][...] = 0
+                dispatched[k][...,-1] = np.rint(np.maximum(action[...,start],0))
+            return orderSize,dispatched
+        orderSize[...] = 0
+        orderSize[...,-1] = np.rint(np.maximum(action[...,0],0))
+        start,stop,_ = self.obsLayout['Depot']['inventory']
+        available = obsVector[...,start:stop].copy()
+        if self.LT > 0:
+            start = self.obsLayout['Depot']['ordered'][0]
+            available += obsVector[...,start:start + self.SL['Depot']] #next delivery
+        else:
+            available += orderSize #delivered at once
+        for k in self.retailers:
+            start,stop = self.actionLayout[k]
+            served = dispatched[k]
+            np.maximum(action[...,start:stop],0,out = served)
+            np.rint(served,out = served)
+            #dispatched[k][d] is taken from the depot items with residual shelf life RLT_k + d + 1
+            np.minimum(served,available[...,self.RLT[k]:],out = served)
+            available[...,self.RLT[k]:] -= served
+        return orderSize,dispatched
+
+
+class FlatDailySimulation(Env):
+    """
+    DailySimulation with flat Box observation and action spaces (see FlatLayout) and the gym API
+    reset(seed) -> (obs, info), step(action) -> (obs, reward, terminated, truncated, info).
+    The end of the horizon (or the convergence in learn mode) truncates the episode.
+    The observation is the read-only vector of the ObservationBuffer, overwritten by the next step.
+    The wrapped env is switched to the buffer observation mode, its other settings (e.g., setRecordHistory) are left as they are.
+    """
+    def __init__(self, env):
+        super(FlatDailySimulation,self).__init__()
+        self.env = env
+        self.env.setObservationMode('buffer')
+        self.layout = FlatLayout(env.retailers,env.depot)
+        self.observation_space = self.layout.observationSpace()
+        self.action_space = self.layout.actionSpace()
+        self.orderSize,self.dispatched = self.layout.newAction()
+
+    def reset(self, *, seed = None, options = None):
+        if seed is not None:
+            self.env.setSeed('All',seed)
+        return self.env.reset().vector,{}
+
+    def step(self, action):
+        self.layout.decodeAction(action,self.env.obsBuffer.vector,self.orderSize,self.dispatched)
+        obs,reward,done,info = self.env.step(self.orderSize,self.dispatched)
+        return obs.vector,reward,False,done,info
+
+
+class FlatBatchSimulation(VectorEnv):
+    """
+    Vectorized environment stepping the N copies of a BatchDailySimulation as one batch, with flat Box spaces (see FlatLayout).
+    The copies run on their own seeds and end together; at the end of the horizon they are reset automatically on the next N seeds
+    (the last observations are given in info['final_observation'], as gym.vector.SyncVectorEnv).
+    """
+    def __init__(self, batchEnv, seeds: list = None):
+        self.batchEnv = batchEnv
+        self.layout = FlatLayout(batchEnv.retailers,batchEnv.depot)
+        super(FlatBatchSimulation,self).__init__(batchEnv.nBatch,self.layout.observationSpace(),self.layout.actionSpace())
+        self.seeds = list(seeds) if seeds is not None else list(range(1,self.num_envs + 1))
+        self.obsVector = np.zeros((self.num_envs,self.layout.obsSize))
+        self.orderSize,self.dispatched = self.layout.newAction(self.num_envs)
+
+    def reset(self, *, seed = None, options = None):
+        #seed: an int (seed, seed+1, ...) or a list of N seeds
+        if seed is not None:
+            self.seeds = [seed + i for i in range(self.num_envs)] if np.isscalar(seed) else list(seed)
+        self.layout.encodeObs(self.batchEnv.reset(self.seeds),self.obsVector)
+        return self.obsVector,{}
+
+    def step(self, actions):
+        self.layout.decodeAction(actions,self.obsVector,self.orderSize,self.dispatched)
+        obs,reward,done,_ = self.batchEnv.step(self.orderSize,self.dispatched)
+        self.layout.encodeObs(obs,self.obsVector)
+        terminated = np.zeros(self.num_envs,dtype = bool)
+        truncated = np.full(self.num_envs,done)
+        info = {}
+        if done:
+            info['final_observation'] = np.empty(self.num_envs,dtype = object)
+            info['final_observation'][:] = list(self.obsVector.copy())
+            info['_final_observation'] = truncated.copy()
+            self.seeds = [s + self.num_envs for s in self.seeds]
+            self.layout.encodeObs(self.batchEnv.reset(self.seeds),self.obsVector)
+        return self.obsVector,reward,terminated,truncated,info
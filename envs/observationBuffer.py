@@ -0,0 +1,72 @@
+"""
+Preallocated observation of a DailySimulation
+"""
+import numpy as np
+from collections.abc import Mapping
+
+class ObservationBuffer(Mapping):
+    """
+    The state of the system S_t = [DC_t | RT_t] stored in one preallocated flat vector (see vector), filled in place at each step.
+    Layout: the 'Depot' block (if any) and then the blocks of the retailers (in the order of the retailers dict).
+    Each block is [pipeline | inventory], with
+        pipeline: 'ordered' (Depot) or 'dispatched' (retailers), the items arriving in 1,...,LT days (rows) per residual shelf life (columns), row-major
+        inventory: on-hand items per residual shelf life 1,...,SL (the oldest first)
+    exactly as the arrays of the observation dict (layout gives node -> key -> (start, stop, shape)).
+    It behaves as the observation dict: obs[node][key] are read-only views with the shapes of the dict arrays.
+    The content is overwritten by the next step, copy it (e.g., obs.vector.copy()) to keep it.
+    """
+    def __init__(self, retailers: dict, depot = None):
+        managers = {}
+        if depot != None:
+            managers['Depot'] = depot
+        for k in retailers.keys():
+            managers[k] = retailers[k]
+        #layout from the observation of each manager
+        self.layout = {}
+        size = 0
+        for name,manager in managers.items():
+            obs = manager.observe()
+            self.layout[name] = {}
+            for key in ['ordered','dispatched','inventory']:
+                if key in obs:
+                    shape = np.shape(obs[key])
+                    self.layout[name][key] = (size, size + int(np.prod(shape)), shape)
+                    size += int(np.prod(shape))
+        self._vector = np.zeros(size)
+        self.vector = self._vector.view()
+        self.vector.flags.writeable = False
+        #writable views (targets of the managers) and read-only views (observation)
+        self.targets = {}
+        self.nodes = {}
+        for name,blocks in self.layout.items():
+            self.targets[name] = {}
+            self.nodes[name] = {}
+            for key,(start,stop,shape) in blocks.items():
+                self.targets[name][key] = self._vector[start:stop].reshape(shape)
+                self.nodes[name][key] = self.vector[start:stop].reshape(shape)
+        self.managers = managers
+
+    def attach(self):
+        #the managers write their observations in the buffer
+        for name,manager in self.managers.items():
+            manager.setObservationTarget(self.targets[name])
+
+    def detach(self):
+        for manager in self.managers.values():
+            manager.setObservationTarget(None)
+
+    def toDict(self):
+        #observation dict (copies)
+        return {name: {key: view.copy() for key,view in blocks.items()} for name,blocks in self.nodes.items()}
+
+    def __getitem__(self, node):
+        return self.nodes[node]
+
+    def __iter__(self):
+        return iter(self.nodes)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def __repr__(self):
+        return repr(self.nodes)
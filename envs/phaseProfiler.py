@@ -0,0 +1,141 @@
+"""
+Opt-in wall-time profiling of the phases of a simulated day
+"""
+import json
+import time
+
+class PhaseProfiler:
+    """
+    Wall-time and number of calls per node ('Depot', the retailers, 'StatManager', 'Policy', 'Simulation') and phase:
+        scenario, lifo: scenario generation (reset) and number of LIFO clients of the day
+        order, delivery: SupplyManager.GetOrder and deliverSupply
+        receive, dispatch, issuing, ageing: InventoryManager receiveSupply, withdraw (depot dispatch), meetDemandLifo/Fifo and updateInventory
+        observation: observation building
+        stats: StatManager updates (updateStatsRetailer of a node is accounted to the node)
+        decide: policy decisions (if a policy is attached)
+        step, reset: the whole step and reset of the node (including its phases), 'other' is the rest of the step
+    attach replaces the methods of the instances with timed wrappers and detach restores them,
+    thus simulations without a profiler run the original code (and the profiled ones pay a wrapper per call).
+    """
+    def __init__(self):
+        self.stats = {} #(node, phase) -> [calls, seconds]
+        self.wrapped = [] #(owner, method name, instance attribute replaced or None)
+
+    def clear(self):
+        for value in self.stats.values():
+            value[0] = 0
+            value[1] = 0
+
+    def attach(self, env, policy = None):
+        """
+        It instruments a DailySimulation (its managers and StatManager) and, if given, the policy deciding its actions
+        """
+        self.detach()
+        nodes = {}
+        if env.depot != None:
+            nodes['Depot'] = env.depot
+        for k in env.retailers.keys():
+            nodes[k] = env.retailers[k]
+        for name,manager in nodes.items():
+            self._wrap(manager,'makeScenario',name,'scenario')
+            self._wrap(manager,'simulateLIFO',name,'lifo')
+            self._wrap(manager.supManager,'GetOrder',name,'order')
+            self._wrap(manager.supManager,'deliverSupply',name,'delivery')
+            self._wrap(manager.invManager,'receiveSupply',name,'receive')
+            self._wrap(manager.invManager,'withdraw',name,'dispatch')
+            for method in ['meetDemandLifo','meetDemandFifo']:
+                self._wrap(manager.invManager,method,name,'issuing')
+            self._wrap(manager.invManager,'updateInventory',name,'ageing')
+            self._wrap(manager,'getObservation',name,'observation')
+            self._wrap(manager,'step',name,'step')
+            self._wrap(manager,'reset',name,'reset')
+        #statistics of the retailers (the depot is the OnLine retailer) to their nodes
+        statNode = {k: ('Depot' if env.depot != None and k == 'OnLine' else k) for k in env.statMgr.ret_list}
+        self._wrap(env.statMgr,'updateStatsRetailer',lambda args: statNode[args[4]],'stats')
+        for method in ['updateClock','updateStatsDepot','checkIfDone']:
+            self._wrap(env.statMgr,method,'StatManager','stats')
+        if policy is not None:
+            self._wrap(policy,'decide','Policy','decide')
+        self._wrap(env,'step','Simulation','step')
+        self._wrap(env,'reset','Simulation','reset')
+
+    def detach(self):
+        for owner,method,attribute in reversed(self.wrapped):
+            if attribute is None:
+                delattr(owner,method)
+            else:
+                setattr(owner,method,attribute)
+        self.wrapped = []
+
+    def _wrap(self, owner, method: str, node, phase: str):
+        original = getattr(owner,method)
+        clock = time.perf_counter
+        stats = self.stats
+        if callable(node):
+            #node from the arguments of the call
+            def timed(*args, **kwargs):
+                start = clock()
+                try:
+                    return original(*args, **kwargs)
+                finally:
+                    value = stats.setdefault((node(args),phase),[0,0])
+                    value[0] += 1
+                    value[1] += clock() - start
+        else:
+            value = stats.setdefault((node,phase),[0,0])
+            def timed(*args, **kwargs):
+                start = clock()
+                try:
+                    return original(*args, **kwargs)
+                finally:
+                    value[0] += 1
+                    value[1] += clock() - start
+        self.wrapped.append((owner,method,owner.__dict__.get(method)))
+        setattr(owner,method,timed)
+
+    def getTable(self):
+        """
+        It returns a list of rows {'node', 'phase', 'calls', 'seconds', 'perCall' (microseconds), 'share' (of the simulation steps)}.
+        'other' rows are the part of the step of each node (and of the simulation) out of its phases. Phases never called are omitted.
+        """
+        totals = {}
+        for (node,phase),(calls,seconds) in self.stats.items():
+            if calls > 0:
+                totals[(node,phase)] = [calls,seconds]
+        #time of the steps out of the phases
+        for node in {node for node,_ in totals.keys()}:
+            if (node,'step') in totals:
+                #statistics are updated by the simulation, scenarios are generated by reset
+                inner = [key for key in totals.keys() if key[0] == node and key[1] not in ['step','reset','stats','scenario']]
+                if node == 'Simulation':
+                    #node steps and statistics are within the simulation step
+                    inner = [key for key in totals.keys() if (key[1] in ['step','stats'] and key[0] != 'Simulation')]
+                calls,seconds = totals[(node,'step')]
+                totals[(node,'other')] = [calls,seconds - sum(totals[key][1] for key in inner)]
+        stepTime = totals.get(('Simulation','step'),[0,0])[1]
+        rows = []
+        for (node,phase),(calls,seconds) in totals.items():
+            rows.append({'node': node, 'phase': phase, 'calls': calls, 'seconds': seconds,
+                         'perCall': 1e6*seconds/calls if calls > 0 else 0, 'share': seconds/stepTime if stepTime > 0 else 0})
+        return sorted(rows,key = lambda row: (row['node'],row['phase']))
+
+    def toJSON(self, path: str = None):
+        """
+        JSON of the table with the number of simulated days, written to path if given
+        """
+        days = self.stats.get(('Simulation','step'),[0,0])[0]
+        text = json.dumps({'days': days, 'rows': self.getTable()}, indent = 1)
+        if path is not None:
+            with open(path,'w') as fp:
+                fp.write(text)
+        return text
+
+    def format(self):
+        #plain text table
+        lines = ['{:<12}{:<12}{:>10}{:>12}{:>14}{:>8}'.format('node','phase','calls','seconds','us per call','share')]
+        for row in self.getTable():
+            lines.append('{:<12}{:<12}{:>10}{:>12.4f}{:>14.2f}{:>7.1f}%'.format(row['node'],row['phase'],row['calls'],row['seconds'],row['perCall'],100*row['share']))
+        return '\n'.join(lines)
+
+    def __str__(self):
+        return self.format()
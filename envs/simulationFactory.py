@@ -0,0 +1,86 @@
+"""
+Builders of the simulation environments of the shipped configurations (as in main_example.py)
+"""
+import json
+from managers import ScenarioGenerationCorr, ScenarioGenerationMulti, InventoryManager, SupplyManager, RetailManager, DepotManager, StatManager
+from .dailySimulation import DailySimulation
+
+def loadConfiguration(conf: str, confDir: str = './configurations'):
+    """
+    conf: 'SingSourceInd' or 'SingSourceDepot'. Notice how the number of character is not random and used to read the correct input.
+    It returns the store setting, the (single) producer and the depot flag.
+    """
+    fp = open(confDir + "/conf_Producers_"+conf[:4]+".json", 'r')
+    prod_setting = json.load(fp)
+    fp.close()
+    fp = open(confDir + "/conf_Store_"+conf[10:]+".json", 'r')
+    store_setting = json.load(fp)
+    fp.close()
+    #single producer
+    producer = prod_setting['A']
+    #Depot? self-configuring flag to either use or not the Depot according to the conf variable
+    flagDepot = (conf[-5:] == 'Depot')
+    return store_setting, producer, flagDepot
+
+def buildSimulation(store_setting: dict, producer: dict, flagDepot: bool, timeHorizon: int, cor: float = -0.5, flagPrint: bool = False, transientDays: int = None):
+    """
+    It builds the managers and the DailySimulation of a configuration.
+    The scenario generator correlates the OnLine and the OffLine channels with the linear correlation cor.
+    With many offline retailers (e.g., multiStoreSetting), one ScenarioGenerationMulti draws all the channels together:
+    each store has correlation cor with the OnLine channel and cor**2 with the other stores (ScenarioGenerationMulti.factorCorrelation).
+    Statistics are accumulated after transientDays (default 3*(SL+LT)).
+    """
+    #Scenario generation with correlated demand for Online and Offline retailers.
+    offLine_setting = {key: store_setting[key] for key in store_setting.keys() if str('OnLine').find(key)}
+    if len(offLine_setting) > 1:
+        scenarioMgr = ScenarioGenerationMulti({'OnLine': store_setting['OnLine'], **offLine_setting},ScenarioGenerationMulti.factorCorrelation(len(offLine_setting),cor))
+        channel = {k: k for k in store_setting.keys()}
+    else:
+        off = store_setting[list(offLine_setting.keys())[0]]
+        scenarioMgr = ScenarioGenerationCorr(store_setting['OnLine']['Distr'], store_setting['OnLine']['ev_Daily'],store_setting['OnLine']['std_Daily'],off['Distr'],off['ev_Daily'],off['std_Daily'],cor)
+        channel = {k: 'OnLine' if k == 'OnLine' else 'OffLine' for k in store_setting.keys()}
+    retailers = {}
+    if flagDepot: #Depot conf.
+        if 'OnLine' not in store_setting.keys():  raise ValueError('Depot must be a vendor on the OnLine channel.')
+        for k in offLine_setting.keys():
+            #The mangers must be albe to deal with the max possible shelf life
+            invManager = InventoryManager(producer['SL'] - producer['LT'] - store_setting.get(k)['RLT'])
+            supManager = SupplyManager(store_setting.get(k)['RLT'], producer['SL'] - producer['LT']  - store_setting.get(k)['RLT'])
+            retailers[k] = RetailManager(k,scenarioMgr,store_setting.get(k)['LIFO%'],invManager,supManager,timeHorizon,store_setting.get(k)['P'],store_setting.get(k)['MD'],scenarioName = channel[k])
+        #Depot (OnLine)
+        invManager = InventoryManager(producer['SL'] - producer['LT'])
+        supManager = SupplyManager(producer['LT'],producer['SL'] - producer['LT'])
+        #delivery times x retail
+        deliveryTimes = {}
+        for k in offLine_setting.keys():
+            deliveryTimes[k] = store_setting.get(k)['RLT']
+        depot = DepotManager(invManager,supManager,deliveryTimes,producer['C'],timeHorizon,scenarioMgr,store_setting['OnLine']['LIFO%'],store_setting['OnLine']['P'],store_setting['OnLine']['MD'])
+    else: # No depot conf
+        depot = None
+        for k in store_setting.keys():
+            invManager = InventoryManager(producer['SL'] - producer['LT'])
+            supManager = SupplyManager(producer['LT'],producer['SL'] - producer['LT'])
+            retailers[k] = RetailManager(k,scenarioMgr,store_setting.get(k)['LIFO%'],invManager,supManager,timeHorizon,store_setting.get(k)['P'],store_setting.get(k)['MD'],producer['C'],scenarioName = channel[k])
+    #StatManager of the simulation
+    statMgr = StatManager(store_setting, flagDepot)
+    statMgr.setTimeHorizon(timeHorizon)
+    #An head defines a transient period to discount the empty-inventory initial conditions
+    if transientDays is None:
+        transientDays = 3*(producer['SL'] + producer['LT'])
+    statMgr.setHead(transientDays)
+    return DailySimulation(retailers,depot,statMgr,timeHorizon,flagPrint)
+
+
+def multiStoreSetting(store_setting: dict, nStores: int):
+    """
+    Setting of a depot with nStores offline retailers 'OffLine_1',...,'OffLine_n', copies of the 'OffLine' store of store_setting
+    (e.g., the one of conf_Store_Depot.json). See MultiRetailerDepotPolicy for the rationing of the depot inventory among them.
+    """
+    setting = {}
+    for k in store_setting.keys():
+        if k == 'OffLine':
+            for i in range(1,nStores + 1):
+                setting['OffLine_' + str(i)] = dict(store_setting[k])
+        else:
+            setting[k] = store_setting[k]
+    return setting
@@ -0,0 +1,53 @@
+"""
+Command line tool writing a ScenarioBankFile (demand paths and pre-drawn LIFO clients per seed) of a configuration.
+Configurations of a design of experiments can be obtained by overriding the settings of the json files, e.g.,
+
+python make_scenario_bank.py --conf SingSourceDepot --corr 0.5 --weeks 5000 --seeds 1 2 3
+    --set OffLine.ev_Daily=50 --set OffLine.LIFO%.params.alpha=9 --set OffLine.LIFO%.params.beta=1 --out ./banks/on50_rho05.bank
+
+The bank is served to the environments by a ScenarioStore:
+
+store = ScenarioStore()
+store.addBankFile('./banks/on50_rho05.bank')
+env.setScenarioStore(store)
+"""
+
+from managers import *
+from envs import *
+import argparse
+import json
+
+def override(setting: dict, assignment: str):
+    #assignment as 'Key.SubKey=value', value is parsed as json when possible
+    path,value = assignment.split('=',1)
+    keys = path.split('.')
+    try:
+        value = json.loads(value)
+    except ValueError:
+        pass
+    for k in keys[:-1]:
+        setting = setting[k]
+    setting[keys[-1]] = value
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Write a memory-mappable scenario bank of a configuration.')
+    parser.add_argument('--conf', default = 'SingSourceDepot', help = "'SingSourceInd' or 'SingSourceDepot'")
+    parser.add_argument('--confDir', default = './configurations')
+    parser.add_argument('--corr', type = float, default = -0.5, help = 'linear correlation of the OnLine and OffLine channels')
+    parser.add_argument('--weeks', type = int, default = 5000, help = 'time horizon in weeks')
+    parser.add_argument('--seeds', type = int, nargs = '+', default = [1])
+    parser.add_argument('--set', action = 'append', default = [], dest = 'overrides', help = "store or producer setting, e.g., OffLine.std_Daily=60 or Producer.SL=6")
+    parser.add_argument('--out', required = True, help = 'output file')
+    args = parser.parse_args()
+
+    store_setting, producer, flagDepot = loadConfiguration(args.conf, args.confDir)
+    for assignment in args.overrides:
+        if assignment.startswith('Producer.'):
+            override(producer, assignment[len('Producer.'):])
+        else:
+            override(store_setting, assignment)
+    timeHorizon = 7*args.weeks
+    env = buildSimulation(store_setting, producer, flagDepot, timeHorizon, args.corr)
+    configuration = {'conf': args.conf, 'corr': args.corr, 'store_setting': store_setting, 'producer': producer}
+    bankFile = ScenarioBankFile.write(args.out, env.retailers, env.depot, timeHorizon, args.seeds, configuration)
+    print('Written', args.out, ':', len(bankFile.seeds), 'seeds x', len(bankFile.nodes), 'nodes x', timeHorizon, 'days (', bankFile.header['dtype'], ')')
@@ -1,4 +1,5 @@
 import numpy as np
+from .TraceManager import TraceManager
 
 class DepotManager():
     """
@@ -10,12 +11,15 @@ class DepotManager():
         self.deliveryTimes = deliveryTimes
         self.cost_dep = cost_depot
         self.timeHorizon = timeHorizon
-        self.flagPrint = False
+        self.trace = None #TraceManager recording the days, if any
+        self.flagPrint = False #the trace is its own and printed at each step (see setFlagPrint)
+        self.scenarioBank = None #pre-drawn demand and LIFO clients (see setScenarioBank)
         #Initialization of retail-oriented quantities
         self.makeScenario()
         self.prices = priceDepot
         self.markdowns = markdownDepot
         #issuing policy
+        self.lifo_params = lifo_params
         if lifo_params['Type'] == 'LS': 
             self.simulateLIFO = lambda x : np.random.binomial(x,np.random.beta(lifo_params['params']['alpha'],lifo_params['params']['beta'],1)).item()
         elif lifo_params['Type'] == 'LF':
@@ -30,6 +34,9 @@ class DepotManager():
         #statistics and plots
         #oreder history, useful to study the shape of the policy per product
         self.history = []
+        self.recordHistory = True #it can be switched off (e.g., optimization runs)
+        #preallocated observation, if any
+        self.obsTarget = None
         self.totProfit = 0
         self.lostDemand = 0
         self.totSold = 0
@@ -38,8 +45,17 @@ class DepotManager():
         #dispatched
         self.totDispatchedPerRet = {}
     #
+    def setTrace(self,trace = None):
+        self.trace = trace
+        self.flagPrint = False
+    #
     def setFlagPrint(self,flag: bool):
+        #pedantic output of each day of this depot alone: it attaches its own TraceManager (DailySimulation flagPrint traces all the managers)
+        self.setTrace(TraceManager() if flag else None)
         self.flagPrint = flag
+    #
+    def setRecordHistory(self,flag: bool):
+        self.recordHistory = flag
 
     def setTimeHorizon(self,timeHorizon):
         self.timeHorizon = timeHorizon
@@ -48,6 +64,8 @@ class DepotManager():
     #
     def reset(self):
         self.current_step = 0
+        if self.flagPrint:
+            self.trace.clear()
         #clear inventories and onOrder
         self.invManager.clearState()
         self.supManager.clearState()
@@ -62,24 +80,54 @@ class DepotManager():
         #dispatched
         for k in self.keys_ret:
             self.totDispatchedPerRet[k] = np.zeros(self.invManager.ShelfLife - self.deliveryTimes[k])
-        ##Observation building
-        obs ={}
-        #sate coherent
-        #Inventory
-        obs["inventory"] = np.zeros(self.invManager.ShelfLife).copy()
-        #We initialize the ordered value stacking up array with length the maximum shelf life. This is due to the possibility of having different suppliers with different
+        ##Observation building (empty inventory and pipeline)
+        #The ordered rows have length the maximum shelf life. This is due to the possibility of having different suppliers with different
         #maximum shelf life (and perhaps differnt costs and lead time). Such variation has not yet been investigated. 
-        for i in range(self.supManager.LeadTime):
-            if i != 0:
-                obs["ordered"] = np.row_stack((obs["ordered"], np.zeros(self.invManager.ShelfLife).copy()))
-            else:
-                obs["ordered"] =  np.zeros(self.invManager.ShelfLife).copy()
+        obs = self.getObservation()
         # returns obs,cost,scrap,profit,salesSum,lostClients
         return obs,0,0,0,0,0
     
+    ##
+    def getStateSize(self):
+        #step, totals, length of the history, dispatched per retailer, inventory and pipeline
+        return 7 + sum(self.invManager.ShelfLife - self.deliveryTimes[k] for k in self.keys_ret) + self.invManager.getStateSize() + self.supManager.getStateSize()
+
+    def saveState(self,buffer):
+        buffer[:7] = [self.current_step,self.totProfit,self.lostDemand,self.totSold,self.totCost,self.totScrapped,len(self.history)]
+        start = 7
+        for k in self.keys_ret:
+            buffer[start:start + len(self.totDispatchedPerRet[k])] = self.totDispatchedPerRet[k]
+            start += len(self.totDispatchedPerRet[k])
+        inv = start + self.invManager.getStateSize()
+        self.invManager.saveState(buffer[start:inv])
+        self.supManager.saveState(buffer[inv:])
+
+    def loadState(self,buffer):
+        self.current_step = int(buffer[0])
+        self.totProfit,self.lostDemand,self.totSold,self.totCost,self.totScrapped = buffer[1:6].tolist()
+        del self.history[int(buffer[6]):] #append-only, restored up to its length at the snapshot
+        start = 7
+        for k in self.keys_ret:
+            self.totDispatchedPerRet[k][:] = buffer[start:start + len(self.totDispatchedPerRet[k])]
+            start += len(self.totDispatchedPerRet[k])
+        inv = start + self.invManager.getStateSize()
+        self.invManager.loadState(buffer[start:inv])
+        self.supManager.loadState(buffer[inv:])
+
     ##
     def makeScenario(self):
-        self.scenario = self.scenarioMgr.makeScenario(self.timeHorizon,'OnLine') #as depot, it can only be the online. 
+        if self.scenarioBank is not None:
+            self.scenario = self.scenarioBank['demand'].reshape(1,-1)
+        else:
+            self.scenario = self.scenarioMgr.makeScenario(self.timeHorizon,'OnLine') #as depot, it can only be the online. 
+    #
+    def setScenarioBank(self,bank: dict = None):
+        """
+        bank = {'demand': array, 'lifo': array} with the demand and the number of LIFO clients of each day (see ScenarioStore).
+        When set, the scenario generator is not employed and LIFO clients are not drawn. None restores the generator.
+        """
+        self.scenarioBank = bank
+        self.makeScenario()
     #
     def step(self,orderSize,dispatched):
         ###new step
@@ -89,61 +137,46 @@ class DepotManager():
         scrapped = 0
         #we order
         self.supManager.GetOrder(orderSize)
-        self.history.append(orderSize)
+        if self.recordHistory:
+            self.history.append(np.copy(orderSize)) #policies may reuse their decision arrays
         ### 
         #we receive the items
         delivered = self.supManager.deliverSupply()
         self.invManager.receiveSupply(delivered)
-        if self.flagPrint:
-            print('Day',self.current_step)
-            print('\t',delivered,' items have just arrived.')
         ###  
         #payment
         cost += self.cost_dep*np.sum(orderSize)
-        if self.flagPrint: 
-            #current inventory
-            print('\nInventory depot before dispatch:')
-            #product insight
-            print('Product Stored')
-            for i in range(self.invManager.ShelfLife):
-                print('\t', self.invManager.Inventory[i],'items with ', i+1, 'Residual shelf life')
-        #we dispatch
+        #Debug trace: delivery and inventory before dispatch
+        if self.flagPrint:
+            self.trace.setDay(self.current_step)
+        tracing = self.trace is not None and self.trace.active
+        if tracing:
+            arrived = np.copy(delivered)
+            stored = self.invManager.Inventory.copy()
+            scrappedSoFar = self.totScrapped
+        #we dispatch: dispatched[k][d] is removed from the items with residual shelf life RLT_k + d + 1, all the retailers at once
+        withdrawn = np.zeros(self.invManager.ShelfLife)
         for k in self.keys_ret:
-            for d in range(self.invManager.ShelfLife - self.deliveryTimes[k]):
-                #remove form inventory what dispatched
-                self.invManager.meetDemand( (self.invManager.ShelfLife - self.deliveryTimes[k]) -  1 - d, dispatched[k][d])
+            withdrawn[self.deliveryTimes[k]:] += dispatched[k]
+        self.invManager.withdraw(withdrawn)
         #Stats update
         for k in self.keys_ret:
             self.totDispatchedPerRet[k] += dispatched[k]
         self.totCost += cost
-        ##Debug prints
-        if self.flagPrint: 
-            print('Oredered by Depot: ',orderSize)
-            for k in self.keys_ret:
-                print(dispatched[k],' units of product dispatched to retailer: ', k)
-                print(self.totDispatchedPerRet[k],' TOTAL of units of product dispatched to retailer: ', k)
-            print( 'Total scrapped so far', self.totScrapped)
-            print( 'Cost of the day ', cost)
-            print( 'Total cost so far ', self.totCost)
-            print('-------------DAY ',self.current_step - 1,'  ENDS -------')
-            print('------------------New day Begins------------------------')
-             #####
+        #####
         #####Morning, the day begins
         #####
         #####
         profit = 0 #profit with no costs included
-        if self.flagPrint: 
-            #current inventory
-            print('\n Day',self.current_step,'\n inventory depot:')
-            #product insight
-            print('Product Stored')
-            for i in range(self.invManager.ShelfLife):
-                print('\t', self.invManager.Inventory[i],'items with ', i+1, 'Residual shelf life')
-            print('Demand: ', self.scenario[0][self.current_step])
+        if tracing:
+            opening = self.invManager.Inventory.copy()
         #aggregated lost and unmet of the current day
         lostClients = 0 #Clients that found no items to buy
-        LifoC = int(self.simulateLIFO(np.rint(self.scenario[0][self.current_step]))) #number of LIFO clients
-        FifoC = int(np.rint(self.scenario[0][self.current_step]) - LifoC) #number of FIFO clients
+        if self.scenarioBank is not None:
+            LifoC = int(self.scenarioBank['lifo'][self.current_step]) #pre-drawn
+        else:
+            LifoC = int(self.simulateLIFO(np.rint(self.scenario[0,self.current_step]))) #number of LIFO clients
+        FifoC = int(np.rint(self.scenario[0,self.current_step]) - LifoC) #number of FIFO clients
         #First lifo then fifo, but since there are no price differences, it has no effect on the retailer proift or number of stockouts.
         LifoSold = self.invManager.meetDemandLifo(LifoC)
         FifoSold = self.invManager.meetDemandFifo(FifoC)
@@ -161,24 +194,52 @@ class DepotManager():
         self.totSold += salesSums
         self.totProfit += profit
         self.totScrapped += scrapped
-        if self.flagPrint:
-            print('Scrapped by Depot: ',scrapped)
-            print(' Depot:\nSold:  ',salesSums,' Scrapped: ',scrapped)
-            print('No purchase: ',lostClients)
-            print( 'Total sold so far', self.totSold)
-            print( 'Profit of the day ', profit)
-            print('------------Night at the Depot-------------')
-    
+        #Debug trace
+        if tracing:
+            row = {'pipeline': self.pipeline()} if self.supManager.LeadTime > 0 else {}
+            for k in self.keys_ret:
+                row['dispatched_' + k] = dispatched[k]
+                row['totDispatched_' + k] = self.totDispatchedPerRet[k]
+            self.trace.record('Depot',delivered = arrived,inventory = stored,ordered = orderSize,cost = cost,totCost = self.totCost,
+                              stock = opening,demand = self.scenario[0,self.current_step],lifo = LifoC,fifo = FifoC,sold = salesSums,
+                              scrapped = scrapped,lost = lostClients,profit = profit,totSold = self.totSold,totScrapped = self.totScrapped,scrappedSoFar = scrappedSoFar,
+                              closing = self.invManager.Inventory,**row)
+            if self.flagPrint:
+                print(self.trace.format(self.current_step))
+
         ##Observation building
-        obs ={}
-        #sate coherent
-        #Inventory post demand
-        obs["inventory"] = self.invManager.Inventory.copy()
-        #AlreadyOrdered
-        for i in range(self.supManager.LeadTime):
-            if i != 0:
-                obs["ordered"] = np.row_stack((obs["ordered"], self.supManager.OnOrder[i].copy()))
-            else:
-                obs["ordered"] = self.supManager.OnOrder[i].copy()
+        #sate coherent, inventory post demand
+        obs = self.getObservation()
         # returns obs,cost,scrap,profit,salesSum,lostClients
-        return obs,cost,scrapped,profit,salesSums,lostClients
\ No newline at end of file
+        return obs,cost,scrapped,profit,salesSums,lostClients
+    #
+    def setObservationTarget(self,target: dict = None):
+        """
+        target = {'inventory': array, 'ordered': array} of preallocated arrays (see envs.ObservationBuffer) filled in place
+        by reset and step, which return it. None restores a new observation dict per step.
+        """
+        self.obsTarget = target
+    #
+    def getObservation(self):
+        if self.obsTarget is None:
+            return self.observe()
+        self.observeInto(self.obsTarget)
+        return self.obsTarget
+    #
+    def observe(self):
+        #current inventory and already ordered items (copies)
+        obs = {}
+        obs["inventory"] = self.invManager.Inventory.copy()
+        if self.supManager.LeadTime > 0:
+            obs["ordered"] = self.pipeline().copy()
+        return obs
+    #
+    def observeInto(self,obs: dict):
+        obs["inventory"][:] = self.invManager.Inventory
+        if self.supManager.LeadTime > 0:
+            obs["ordered"][:] = self.pipeline()
+    #
+    def pipeline(self):
+        #items arriving in 1,...,LeadTime days: a (LeadTime,SL) view, a (SL,) view if LeadTime is 1
+        onOrder = self.supManager.OnOrder[:self.supManager.LeadTime]
+        return onOrder[0] if self.supManager.LeadTime == 1 else onOrder
@@ -6,19 +6,58 @@ class InventoryManager:
     This InventoryManager implementation deals with one single customers per step
     it manages the invetory according to the ShelfLife.
     The constructor needs the maximum shelf life
+
+    The inventory is stored as an age-indexed ring buffer written twice (mirrored), so that ageing is a pointer rotation
+    and the inventory ordered by residual shelf life is always a contiguous window of the buffer.
+    Inventory is such a zero-copy (read-only) view, where the index is the residual shelf life minus one.
     """
     def __init__(self, ShelfLife):
-        self.Inventory = np.zeros(ShelfLife)
         self.ShelfLife = ShelfLife
+        self.clearState()
     # Clean up inventory
     def clearState(self):
-        self.Inventory = np.zeros(self.ShelfLife)
+        self._ring = np.zeros(2*self.ShelfLife)
+        self._head = 0
+    #state as a flat vector (see DailySimulation.snapshot): the ring buffer and its head
+    def getStateSize(self):
+        return 2*self.ShelfLife + 1
+    def saveState(self, buffer):
+        buffer[:-1] = self._ring
+        buffer[-1] = self._head
+    def loadState(self, buffer):
+        self._ring[:] = buffer[:-1]
+        self._head = int(buffer[-1])
+    #Ordered view of the inventory
+    @property
+    def Inventory(self):
+        view = self._ring[self._head:self._head + self.ShelfLife]
+        view.flags.writeable = False
+        return view
+    @Inventory.setter
+    def Inventory(self, value):
+        self._head = 0
+        self._ring[:self.ShelfLife] = value
+        self._ring[self.ShelfLife:] = value
+    #writable window and its mirror synchronization (after in-place changes of the window)
+    def _window(self):
+        return self._ring[self._head:self._head + self.ShelfLife]
+    def _sync(self):
+        self._ring[self._head + self.ShelfLife:] = self._ring[self._head:self.ShelfLife]
+        self._ring[:self._head] = self._ring[self.ShelfLife:self.ShelfLife + self._head]
+    #single slot updates (both copies)
+    def _set(self, index, value):
+        self._ring[self._head + index] = value
+        self._ring[(self._head + index + self.ShelfLife)%(2*self.ShelfLife)] = value
+    def _add(self, index, value):
+        self._ring[self._head + index] += value
+        self._ring[(self._head + index + self.ShelfLife)%(2*self.ShelfLife)] += value
     # Update Inventory
     def updateInventory(self):
-        Scrapped = self.Inventory[0]
-        for i in range(self.ShelfLife - 1):
-            self.Inventory[i] = self.Inventory[i+1]
-        self.Inventory[self.ShelfLife-1] = 0
+        #the oldest slot is scrapped and becomes the freshest (empty) one
+        Scrapped = self._ring[self._head]
+        self._ring[self._head] = 0
+        self._ring[self._head + self.ShelfLife] = 0
+        self._head = (self._head + 1)%self.ShelfLife
         return Scrapped
     def receiveSupply(self, orderSize):
         #orderSize is either an array with dim the shelfLife (a depot dispatches)
@@ -27,37 +66,37 @@ class InventoryManager:
             if orderSize.size != self.ShelfLife: #check the size
                 raise ValueError('OrderSize must be equal to the allowed max shelfLife')
             else:
-                for i in range(self.ShelfLife):
-                    self.Inventory[i] += orderSize[i] #index is the residual shelf life, the higher the newer
+                self._window()[:] += orderSize #index is the residual shelf life, the higher the newer
+                self._sync()
         else:
-            self.Inventory[self.ShelfLife-1] = np.rint(orderSize)
+            self._set(self.ShelfLife-1, np.rint(orderSize))
     #Functions that simulates the demand fulfillment of 1 single item per call
+    #as the former loops, no sales are the integer 0 (thus the lost clients and the totals stay integer until the first sale)
     def meetDemandLifo(self, howmany = 1):
-        Sales = max(0,np.min([howmany,np.sum(self.Inventory)]))
-        toSell = Sales
-        for age in range(self.ShelfLife):
-            disp = self.Inventory[self.ShelfLife - age - 1 ]
-            self.Inventory[self.ShelfLife - age - 1 ] -= max(0,np.min([toSell,disp]))
-            toSell -= max(0,np.min([toSell,disp]))
-        return Sales
+        Sales = issueStock(self._window(), howmany, lifo = True)
+        self._sync()
+        return Sales if Sales > 0 else 0
     
     def meetDemandFifo(self, howmany = 1):
-        Sales = max(0,np.min([howmany,np.sum(self.Inventory)]))
-        toSell = Sales
-        for ageRev in range(self.ShelfLife):
-            disp = self.Inventory[ageRev]
-            self.Inventory[ageRev] -= max(0,np.min([toSell,disp]))
-            toSell -= max(0,np.min([toSell,disp]))
-        return Sales
+        Sales = issueStock(self._window(), howmany, lifo = False)
+        self._sync()
+        return Sales if Sales > 0 else 0
 
     def meetDemand(self,age, howmany = 1):
         if (not self.isAvailable(howmany)) or (not self.isAvailableAge(age,howmany)):
             raise ValueError("The customer cannot buy something missing")
         else:
             Sales = howmany
-            self.Inventory[self.ShelfLife - age - 1 ] -= Sales
+            self._add(self.ShelfLife - age - 1, -Sales)
         return Sales
 
+    def withdraw(self, quantities: np.array):
+        #it removes quantities per residual shelf life (indexed as Inventory) at once, e.g., the dispatches to all the retailers
+        if np.any(quantities > self.Inventory):
+            raise ValueError("The customer cannot buy something missing")
+        self._window()[:] -= quantities
+        self._sync()
+
     # Is this product in stock?
     def isAvailable(self, howmany = 1): 
         return sum(self.Inventory) >= howmany
@@ -70,3 +109,21 @@ class InventoryManager:
     def getProductAvailabilty(self):
         return list(map(bool,self.Inventory.tolist()))
 
+
+def issueStock(inventory, howmany, lifo):
+    """
+    Closed-form issuing of howmany items from an age-based inventory (index is the residual shelf life - 1),
+    either from the newest ages (LIFO) or from the oldest ones (FIFO).
+    The depletion of every age bucket is computed at once by clipping the cumulative stock at the sales.
+    inventory can be a (SL,) array with a scalar howmany or a (N,SL) matrix with a (N,) howmany (batched version).
+    The inventory (non-negative) is depleted in place and the sales are returned.
+    Precondition: integer stock (as the simulation holds it). Then sales and remaining stock are bit-identical to the former
+    age-by-age loops (see check_issuing.py). With fractional stock the cumulative sums round differently, thus the result can
+    differ in the last bits; the stock left is clamped at zero.
+    """
+    Sales = np.maximum(0,np.minimum(howmany,np.sum(inventory,axis = -1)))
+    issuing = inventory[...,::-1] if lifo else inventory
+    taken = np.minimum(np.cumsum(issuing,axis = -1),np.expand_dims(Sales,-1))
+    issuing -= np.diff(taken,axis = -1,prepend = 0)
+    np.maximum(issuing,0,out = issuing)
+    return Sales
@@ -1,19 +1,25 @@
 import numpy as np
+from .TraceManager import TraceManager
 
 class RetailManager():
     """
     """
-    def __init__(self,name,scenarioMgr,lifo_params,invManager,supManager,timeHorizon,pricesRetail,markdownRetail,costRetailer = 0):
+    def __init__(self,name,scenarioMgr,lifo_params,invManager,supManager,timeHorizon,pricesRetail,markdownRetail,costRetailer = 0,scenarioName = None):
         self.scenarioMgr = scenarioMgr
+        #channel of the scenario generator ('OnLine' or 'OffLine'), the name of the retailer by default
+        self.scenarioName = scenarioName if scenarioName is not None else name
         self.invManager = invManager
         self.supManager = supManager
-        self.flagPrint = False
+        self.trace = None #TraceManager recording the days, if any
+        self.flagPrint = False #the trace is its own and printed at each step (see setFlagPrint)
         self.timeHorizon = timeHorizon
         self.name = name
+        self.scenarioBank = None #pre-drawn demand and LIFO clients (see setScenarioBank)
         self.makeScenario()
         self.prices = pricesRetail
         self.markdowns = markdownRetail
         #issuing policy
+        self.lifo_params = lifo_params
         if lifo_params['Type'] == 'LS': 
             self.simulateLIFO = lambda x: np.random.binomial(x,np.random.beta(lifo_params['params']['alpha'],lifo_params['params']['beta'],1)).item()
         elif lifo_params['Type'] == 'LF':
@@ -31,37 +37,55 @@ class RetailManager():
         self.totDispatched = 0
         #sales per product per day
         self.history = []
+        self.recordHistory = True #it can be switched off (e.g., optimization runs)
+        #preallocated observation, if any
+        self.obsTarget = None
         #only if there is not a depot
         self.cost = costRetailer
     #
+    def setTrace(self,trace = None):
+        self.trace = trace
+        self.flagPrint = False
+    #
     def setFlagPrint(self,flag: bool):
+        #pedantic output of each day of this retailer alone: it attaches its own TraceManager (DailySimulation flagPrint traces all the managers)
+        self.setTrace(TraceManager() if flag else None)
         self.flagPrint = flag
     #
+    def setRecordHistory(self,flag: bool):
+        self.recordHistory = flag
+    #
     def setTimeHorizon(self,timeHorizon):
         #when the time horizon is updated, the scenario is updated as well
         self.timeHorizon = timeHorizon
         self.makeScenario() 
     #
     def makeScenario(self):
-        self.scenario = self.scenarioMgr.makeScenario(self.timeHorizon,self.name)
+        if self.scenarioBank is not None:
+            self.scenario = self.scenarioBank['demand'].reshape(1,-1)
+        else:
+            self.scenario = self.scenarioMgr.makeScenario(self.timeHorizon,self.scenarioName)
+    #
+    def setScenarioBank(self,bank: dict = None):
+        """
+        bank = {'demand': array, 'lifo': array} with the demand and the number of LIFO clients of each day (see ScenarioStore).
+        When set, the scenario generator is not employed and LIFO clients are not drawn. None restores the generator.
+        """
+        self.scenarioBank = bank
+        self.makeScenario()
     #
     def reset(self):
         self.current_step = 0
+        if self.flagPrint:
+            self.trace.clear()
         #clear inventories and onOrder
         self.invManager.clearState()
         self.supManager.clearState()
         self.history = []
-        #observation
-        obs = {}
-        obs['inventory'] = np.zeros(self.invManager.ShelfLife).copy()
-        obs['dispatched'] = []
-        #We initialize the dispatched value stacking up array with length the maximum shelf life. This is due to the possibility of having different suppliers with different
+        #observation (empty inventory and pipeline)
+        #The dispatched rows have length the maximum shelf life. This is due to the possibility of having different suppliers with different
         #maximum shelf life (and perhaps differnt costs and lead time). Such variation has not yet been investigated. 
-        for i in range(self.supManager.LeadTime):
-            if i != 0:
-                obs['dispatched'] = np.row_stack((obs['dispatched'], np.zeros(self.invManager.ShelfLife).copy()))
-            else:
-                obs['dispatched'] = np.zeros(self.invManager.ShelfLife).copy()
+        obs = self.getObservation()
 
         #clear statistics
         self.totProfit = 0
@@ -73,34 +97,39 @@ class RetailManager():
         #
         return obs,0,0,0,0
     #
+    def getStateSize(self):
+        #step, totals, length of the history, inventory and pipeline
+        return 7 + self.invManager.getStateSize() + self.supManager.getStateSize()
+    #
+    def saveState(self,buffer):
+        buffer[:7] = [self.current_step,self.totProfit,self.lostDemand,self.totScrapped,self.totSold,self.totDispatched,len(self.history)]
+        inv = 7 + self.invManager.getStateSize()
+        self.invManager.saveState(buffer[7:inv])
+        self.supManager.saveState(buffer[inv:])
+    #
+    def loadState(self,buffer):
+        self.current_step = int(buffer[0])
+        self.totProfit,self.lostDemand,self.totScrapped,self.totSold,self.totDispatched = buffer[1:6].tolist()
+        del self.history[int(buffer[6]):] #append-only, restored up to its length at the snapshot
+        inv = 7 + self.invManager.getStateSize()
+        self.invManager.loadState(buffer[7:inv])
+        self.supManager.loadState(buffer[inv:])
+    #
     def step(self,orderSize: np.array):
         #simulation of one day
         #new step
         self.current_step += 1
         #Shipped items from the depot at the end of the day
         self.supManager.GetOrder(orderSize)
-        self.history.append(orderSize)
-        #Debug prints
-        if self.flagPrint: 
-            #current inventory
-            print('------------------------------------------')
-            print('RETAILER: ',self.name)
-            print('\nDay',self.current_step,'\nInventory:')
-            #product insight
-            print('Product Stored')
-            for i in range(self.invManager.ShelfLife-1):
-                print('\t', self.invManager.Inventory[i],'items with ', i+1, 'Residual shelf life')
-            #current on order
-            print(' shipped by depot to retailer ', self.name, ':')
-            #Depot actions on this retailer
-            print('Waiting for: ')
-            for i in range(self.supManager.LeadTime+1):
-                if i != 0:
-                    print('\t',np.rint(self.supManager.OnOrder[i]),' items, expected in', i, 'days')
-                else:
-                    print('\t',np.rint(self.supManager.OnOrder[i]),' items have just arrived.')
-            #total demand
-            print('Demand: ', self.scenario[0][self.current_step])
+        if self.recordHistory:
+            self.history.append(np.copy(orderSize)) #policies may reuse their decision arrays
+        #Debug trace: inventory and items on order (the ones arriving first) at the opening
+        if self.flagPrint:
+            self.trace.setDay(self.current_step)
+        tracing = self.trace is not None and self.trace.active
+        if tracing:
+            opening = self.invManager.Inventory.copy()
+            onOrder = self.supManager.OnOrder[:self.supManager.LeadTime+1].copy()
         #####
         #The store opens
         #####
@@ -108,15 +137,14 @@ class RetailManager():
         delivered = self.supManager.deliverSupply()
         self.invManager.receiveSupply(delivered)
         #we sell them
-        LifoC = int(self.simulateLIFO(np.rint(self.scenario[0][self.current_step]))) #number of LIFO clients
-        FifoC = int(np.rint(self.scenario[0][self.current_step]) - LifoC) #number of FIFO clients
-        if self.flagPrint: 
-            print("Lifo = ",LifoC," Fifo = ",FifoC)
+        if self.scenarioBank is not None:
+            LifoC = int(self.scenarioBank['lifo'][self.current_step]) #pre-drawn
+        else:
+            LifoC = int(self.simulateLIFO(np.rint(self.scenario[0,self.current_step]))) #number of LIFO clients
+        FifoC = int(np.rint(self.scenario[0,self.current_step]) - LifoC) #number of FIFO clients
         #First lifo then fifo, but since there are no price differences, it has no effect on the retailer proift or number of stockouts.
         LifoSold = self.invManager.meetDemandLifo(LifoC)
         FifoSold = self.invManager.meetDemandFifo(FifoC)
-        if self.flagPrint: 
-            print("Sold Lifo = ",LifoSold," Sold Fifo = ",FifoSold)
         lostClients = LifoC +  FifoC - LifoSold - FifoSold #Clients that found no items to buy
         salesSums = LifoSold + FifoSold
         #####
@@ -133,29 +161,53 @@ class RetailManager():
         profit += self.prices*salesSums + self.markdowns*scrapped
         self.totSold += salesSums
         self.totProfit += profit
-        #Debug prints
-        if self.flagPrint:
-            print(' Dispatched/Ordered(if no depot) product: ',orderSize,' Sold:  ',salesSums,' Scrapped: ',scrapped)
-            print('No purchase: ',lostClients)
-            print( 'Total dispatched by the depot/orederd by retailer so far ', self.totDispatched)
-            print( 'Total scrapped so far', self.totScrapped)
-            print( 'Total sold so far', self.totSold)
-            print( 'Profit of the day ', profit)
-            print('------------------------------------------')
+        #Debug trace
+        if tracing:
+            row = {} if self.cost == 0 else {'cost': np.sum(orderSize)*self.cost} #cost of the retailers without depot
+            if self.supManager.LeadTime > 0:
+                row['pipeline'] = self.pipeline()
+            self.trace.record(self.name,inventory = opening,onOrder = onOrder,demand = self.scenario[0,self.current_step],lifo = LifoC,fifo = FifoC,
+                              lifoSold = LifoSold,fifoSold = FifoSold,dispatched = orderSize,sold = salesSums,scrapped = scrapped,lost = lostClients,
+                              profit = profit,totDispatched = self.totDispatched,totScrapped = self.totScrapped,totSold = self.totSold,
+                              closing = self.invManager.Inventory,**row)
+            if self.flagPrint:
+                print(self.trace.format(self.current_step))
         #### it returns the current inventory after scrapping
         #### the profit of the day
         #observation
-        obs = {}
-        obs['inventory'] = self.invManager.Inventory.copy()
-        obs['dispatched'] = []
-        for i in range(self.supManager.LeadTime):
-            if i != 0:
-                obs['dispatched'] = np.row_stack((obs['dispatched'], self.supManager.OnOrder[i].copy()))
-            else:
-                obs['dispatched'] = self.supManager.OnOrder[i].copy()
-
+        obs = self.getObservation()
         #### 
         return obs,profit,scrapped,salesSums,lostClients
+    #
+    def setObservationTarget(self,target: dict = None):
+        """
+        target = {'inventory': array, 'dispatched': array} of preallocated arrays (see envs.ObservationBuffer) filled in place
+        by reset and step, which return it. None restores a new observation dict per step.
+        """
+        self.obsTarget = target
+    #
+    def getObservation(self):
+        if self.obsTarget is None:
+            return self.observe()
+        self.observeInto(self.obsTarget)
+        return self.obsTarget
+    #
+    def observe(self):
+        #current inventory and dispatched items (copies)
+        obs = {}
+        obs['inventory'] = self.invManager.Inventory.copy()
+        obs['dispatched'] = self.pipeline().copy() if self.supManager.LeadTime > 0 else []
+        return obs
+    #
+    def observeInto(self,obs: dict):
+        obs['inventory'][:] = self.invManager.Inventory
+        if self.supManager.LeadTime > 0:
+            obs['dispatched'][:] = self.pipeline()
+    #
+    def pipeline(self):
+        #items arriving in 1,...,LeadTime days: a (LeadTime,SL) view, a (SL,) view if LeadTime is 1
+        onOrder = self.supManager.OnOrder[:self.supManager.LeadTime]
+        return onOrder[0] if self.supManager.LeadTime == 1 else onOrder
 
     #####
     def computeCost(self,orderSize: np.array):
@@ -163,7 +215,5 @@ class RetailManager():
         if self.cost == 0:
             raise ValueError('If a Depot dispatches the orders, the retailer cannot compute the costs.')
         dayCost = np.sum(orderSize)*self.cost
-        if self.flagPrint: 
-            print( 'Cost of the day retailer',self.name ,' = ', dayCost )
         return dayCost 
 
@@ -0,0 +1,86 @@
+import json
+import numpy as np
+from .ScenarioStore import ScenarioStore, replayScenario, _nodes
+
+class ScenarioBankFile:
+    """
+    Compact binary file of scenario banks (e.g., one per configuration of a design of experiments), read by np.memmap.
+    For each seed it holds the demand path and the pre-drawn number of LIFO clients of each node of the simulation
+    (the 'Depot', i.e., the OnLine channel, if any, and the retailers), as DailySimulation draws them.
+
+    Format:
+        8 bytes   magic b'PMECBANK'
+        8 bytes   header length (little-endian uint64)
+        header    JSON (utf-8) with version, dtype, shape, seeds, nodes, timeHorizon, keys and configuration, padded to 64 bytes
+        data      C-ordered array of shape (nSeeds, 2*nNodes, timeHorizon), rows (demand, lifo) per node.
+                  int32 when every marginal is integer (NB), float64 otherwise.
+
+    Slices are served zero-copy from the page cache, so processes reading the same file share one copy.
+    """
+    MAGIC = b'PMECBANK'
+    VERSION = 1
+
+    def __init__(self, fileName: str):
+        self.fileName = fileName
+        with open(fileName, 'rb') as fp:
+            if fp.read(8) != ScenarioBankFile.MAGIC:
+                raise ValueError('Not a scenario bank file.')
+            headerLength = int(np.frombuffer(fp.read(8), dtype = '<u8')[0])
+            self.header = json.loads(fp.read(headerLength).decode('utf-8'))
+        if self.header['version'] != ScenarioBankFile.VERSION:
+            raise ValueError('Scenario bank version not supported.')
+        self.seeds = self.header['seeds']
+        self.nodes = self.header['nodes']
+        self.timeHorizon = self.header['timeHorizon']
+        self.configuration = self.header['configuration']
+        self.data = np.memmap(fileName, dtype = self.header['dtype'], mode = 'r', offset = 16 + headerLength, shape = tuple(self.header['shape']))
+        #ScenarioStore keys -> seed position
+        self.keys = {key: i for i,key in enumerate(self.header['keys'])}
+
+    @staticmethod
+    def write(fileName: str, retailers, depot, timeHorizon: int, seeds: list, configuration: dict = {}):
+        """
+        It generates (replays) the scenarios of a simulation (retailers dict and depot, None if there is no depot) for each seed
+        and it writes them in fileName. configuration is any JSON-serializable description saved in the header.
+        """
+        nodes = _nodes(retailers,depot)
+        integer = all(_isInteger(manager.scenarioMgr) for manager in nodes.values())
+        dtype = 'int32' if integer else 'float64'
+        shape = (len(seeds), 2*len(nodes), timeHorizon)
+        store = ScenarioStore()
+        header = {'version': ScenarioBankFile.VERSION, 'dtype': dtype, 'shape': shape, 'seeds': list(seeds), 'nodes': list(nodes.keys()),
+                  'timeHorizon': timeHorizon, 'keys': [store.getKey(retailers,depot,timeHorizon,s) for s in seeds], 'configuration': configuration}
+        headerBytes = json.dumps(header).encode('utf-8')
+        headerBytes += b' '*((-(16 + len(headerBytes)))%64) #data aligned to 64 bytes
+        with open(fileName, 'wb') as fp:
+            fp.write(ScenarioBankFile.MAGIC)
+            fp.write(np.array([len(headerBytes)], dtype = '<u8').tobytes())
+            fp.write(headerBytes)
+        data = np.memmap(fileName, dtype = dtype, mode = 'r+', offset = 16 + len(headerBytes), shape = shape)
+        for i,s in enumerate(seeds):
+            demand,lifo = replayScenario(retailers,depot,timeHorizon,s)
+            for j,name in enumerate(nodes.keys()):
+                data[i,2*j] = demand[name]
+                data[i,2*j + 1] = lifo[name]
+        data.flush()
+        del data
+        return ScenarioBankFile(fileName)
+
+    def getBank(self, seed):
+        """
+        It returns a dict node -> {'demand': (timeHorizon,) view, 'lifo': (timeHorizon,) view} (as ScenarioStore.getBank)
+        """
+        i = self.seeds.index(seed)
+        return {name: {'demand': self.data[i,2*j], 'lifo': self.data[i,2*j + 1]} for j,name in enumerate(self.nodes)}
+
+    def getSlice(self, seed, node: str, start: int = 0, stop: int = None, lifo: bool = False):
+        """
+        Zero-copy view of the demand (or LIFO clients) of a node between the days start and stop
+        """
+        return self.data[self.seeds.index(seed),2*self.nodes.index(node) + int(lifo),start:stop]
+
+
+def _isInteger(scenarioMgr):
+    #NB marginals only (the channels of ScenarioGenerationMulti, OnLine and OffLine of ScenarioGenerationCorr)
+    dists = getattr(scenarioMgr,'dists',[getattr(scenarioMgr,'distOn',None),getattr(scenarioMgr,'distOff',None)])
+    return all(d == 'NB' for d in dists)
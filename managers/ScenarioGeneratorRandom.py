@@ -5,40 +5,74 @@ class ScenarioGenerationCorr:
     """
     This class generates a correlated scenario with negative binomial demand for exactly 2 distribution (Online and Offline).
     It uses a multivariate gaussian copula to generate the correlation by means of a linear correlation coefficient
-    TODO: a next step concerns a further generalization of the distribution kind and a greater number of retailers
+    (see ScenarioGenerationMulti for any number of channels with a correlation matrix).
+    TODO: a next step concerns a further generalization of the distribution kind
+
+    Negative binomial marginals are inverted by means of CDF lookup tables (see setPpfTable), built once per (n,p) and
+    shared by all the instances.
     """
+    #inverse CDF tables of the negative binomial marginals, key (n,p,tailQuantile)
+    ppfTables = {}
+
     def __init__(self, distOn, muOn, sigmaOn, distOff, muOff, sigmaOff, cor):
+        #parameters (e.g., to identify the scenarios it generates)
+        self.params = (distOn, muOn, sigmaOn, distOff, muOff, sigmaOff, cor)
         #Marginal distributions
         #Online retailer
         self.distOn = distOn
         self.distOff = distOff
         #Online retailer
-        if self.distOn == 'Normal':
-            self.On = stats.norm(muOn,sigmaOn)
-        elif self.distOn == 'NB':
-            self.pOn = muOn/(sigmaOn**2)
-            self.nOn = (muOn*self.pOn)/((1 - self.pOn))
-            self.On = stats.nbinom(self.nOn,self.pOn)
-        else:
-            raise ValueError('Distribution type not found')
+        self.On,self.nOn,self.pOn = _marginal(distOn,muOn,sigmaOn)
         #Offline retailer
-        if self.distOff == 'Normal':
-            self.Off = stats.norm(muOff,sigmaOff)
-        elif self.distOff == 'NB':
-            self.pOff = muOff/(sigmaOff**2)
-            self.nOff = (muOff*self.pOff)/((1 - self.pOff))
-            self.Off = stats.nbinom(self.nOff,self.pOff)
-        else:
-            raise ValueError('Distribution type not found')        
+        self.Off,self.nOff,self.pOff = _marginal(distOff,muOff,sigmaOff)
         #seed
         self.seed = None
         #when the scenario generator generates a sample this becomes True. Use reset to make it False
         self.generated = False
         #mvr multivariate gaussian copula component
+        self.cor = cor
         self.mvnorm = stats.multivariate_normal(mean=[0,0], cov=[[1., cor], [cor, 1.]])
+        #chunked generation (None = the full horizon is drawn at each reset)
+        self.chunkSize = None
+        self.maxCachedChunks = 2
+        #NB inverse CDF by lookup table
+        self.usePpfTable = True
+        self.tailQuantile = 1 - 1e-12
 
     def setSeed(self,seed):
         self.seed = seed
+
+    def setPpfTable(self,flag: bool = True, tailQuantile: float = 1 - 1e-12):
+        """
+        If True, the NB marginals are inverted by searching the uniforms in the CDF tabulated up to tailQuantile.
+        Uniforms in the extreme tail (or within few ulps from a tabulated value) employ the exact scipy ppf,
+        therefore the demand is identical to the one of the scipy ppf.
+        """
+        if tailQuantile >= 1 or tailQuantile <= 0:
+            raise ValueError('Please set a valid quantile between 0 and 1.')
+        self.usePpfTable = flag
+        self.tailQuantile = tailQuantile
+
+    def ppf(self,marginal: str,u):
+        """
+        Inverse CDF of a marginal ('On' or 'Off') applied to an array of uniforms
+        """
+        frozen = getattr(self,marginal)
+        if getattr(self,'dist' + marginal) != 'NB' or not self.usePpfTable:
+            return frozen.ppf(u)
+        return _tablePpf(frozen,(getattr(self,'n' + marginal),getattr(self,'p' + marginal),self.tailQuantile),u)
+
+    def setChunkSize(self,chunkSize = None):
+        """
+        If chunkSize is set, the demand is generated lazily in blocks of chunkSize days when accessed and at most
+        maxCachedChunks blocks are kept in memory. Each day employs its own pair of counter-based (Philox) uniforms,
+        so the scenario only depends on the seed, not on the chunk size or on the order of the accesses.
+        Notice that it is a different stream from the one of the full-horizon generation (chunkSize = None).
+        """
+        if chunkSize is not None and chunkSize <= 0:
+            raise ValueError('Please set a positive chunk size.')
+        self.chunkSize = chunkSize
+        self.generated = False #the next access generates the new scenario
         
     #Fixed seed reset
     def reset(self, timeHorizon = None):
@@ -47,6 +81,13 @@ class ScenarioGenerationCorr:
         #if no time horizon specified, use the one we saved in last makeScenario call. 
         if timeHorizon == None:
             timeHorizon = self.timeHorizon
+        if self.chunkSize is not None:
+            #nothing is drawn here, chunks are generated when accessed
+            self.entropy = self.seed if self.seed is not None else np.random.SeedSequence().entropy
+            self.chunks = {}
+            self.demandScenarioOn = ScenarioStream(self,0,timeHorizon)
+            self.demandScenarioOff = ScenarioStream(self,1,timeHorizon)
+            return
         #rmnvnorm
         copula = stats.norm.cdf(self.mvnorm.rvs(timeHorizon))
         #pre-allocation
@@ -54,8 +95,8 @@ class ScenarioGenerationCorr:
         self.demandScenarioOff = np.zeros( (1, timeHorizon) )
         self.demandScenarioOn = np.zeros( (1, timeHorizon) )
 
-        self.demandScenarioOn[0] = self.On.ppf(copula[:,0])
-        self.demandScenarioOff[0] = self.Off.ppf(copula[:,1])
+        self.demandScenarioOn[0] = self.ppf('On',copula[:,0])
+        self.demandScenarioOff[0] = self.ppf('Off',copula[:,1])
     
     def makeScenario(self, timeHorizon, ret):
         """
@@ -80,7 +121,227 @@ class ScenarioGenerationCorr:
         else:
             raise ValueError('retailer not available.')
         
+    def getChunk(self,b):
+        """
+        Demand of the b-th chunk of days, as a (chunkSize,2) array (OnLine, OffLine)
+        """
+        b = int(b)
+        if b in self.chunks:
+            return self.chunks[b]
+        #counter-based stream: day t employs the uniforms 2t and 2t+1 (Philox advances by blocks of 4 draws)
+        start = b*self.chunkSize
+        bitGen = np.random.Philox(self.entropy)
+        bitGen.advance(start//2)
+        rng = np.random.Generator(bitGen)
+        if start%2:
+            rng.random(2)
+        u = np.maximum(rng.random((self.chunkSize,2)),np.finfo(float).tiny)
+        #gaussian copula
+        z = self.cor*stats.norm.ppf(u[:,0]) + np.sqrt(1 - self.cor**2)*stats.norm.ppf(u[:,1])
+        chunk = np.zeros((self.chunkSize,2))
+        chunk[:,0] = self.ppf('On',u[:,0])
+        chunk[:,1] = self.ppf('Off',stats.norm.cdf(z))
+        #bounded memory
+        if len(self.chunks) >= self.maxCachedChunks:
+            del self.chunks[next(iter(self.chunks))]
+        self.chunks[b] = chunk
+        return chunk
+
     #Time Horizon check
     def checkTimeHorizon(self,timeHorizon):
         if timeHorizon%7: #if not multiple of 7 it will raise the error
-            raise ValueError('The environment is weekly based. TimeHorizon must be multiple of 7')
\ No newline at end of file
+            raise ValueError('The environment is weekly based. TimeHorizon must be multiple of 7')
+
+
+class ScenarioGenerationMulti(ScenarioGenerationCorr):
+    """
+    Correlated scenarios of any number of channels, e.g., the OnLine channel and many offline stores, from one shared draw.
+    channels: dict name -> {'Distr': 'NB' or 'Normal', 'ev_Daily', 'std_Daily'} (e.g., the entries of a store setting)
+    cor: (n,n) correlation matrix of the gaussian copula, rows in the order of channels (see factorCorrelation)
+
+    The matrix is factorized once (Cholesky, cor = L L^T): the independent standard normals z of a day become the copula
+    normals L z, whose CDF is inverted column by column by the marginals (NB by lookup table as in ScenarioGenerationCorr).
+    The full horizon is drawn in blocks of blockSize days (the scenario does not depend on it); with setChunkSize the days
+    are generated lazily from counter-based uniforms and at most maxCachedChunks blocks of all the channels are kept in memory.
+    makeScenario serves the channels by name.
+    """
+    def __init__(self, channels: dict, cor):
+        self.channels = list(channels.keys())
+        nChannels = len(self.channels)
+        self.cor = np.array(cor,dtype = float)
+        if self.cor.shape != (nChannels,nChannels) or not np.allclose(self.cor,self.cor.T) or not np.allclose(np.diag(self.cor),1):
+            raise ValueError('Please set a symmetric correlation matrix with unit diagonal and a row per channel.')
+        try:
+            self.cholesky = np.linalg.cholesky(self.cor)
+        except np.linalg.LinAlgError:
+            raise ValueError('The correlation matrix must be positive definite.')
+        #parameters (e.g., to identify the scenarios it generates)
+        self.params = (tuple((k,channels[k]['Distr'],channels[k]['ev_Daily'],channels[k]['std_Daily']) for k in self.channels),
+                       tuple(map(tuple,self.cor.tolist())))
+        #Marginal distributions (frozen, n, p)
+        self.dists = [channels[k]['Distr'] for k in self.channels]
+        self.marginals = [_marginal(channels[k]['Distr'],channels[k]['ev_Daily'],channels[k]['std_Daily']) for k in self.channels]
+        #seed
+        self.seed = None
+        self.generated = False
+        #days drawn at once by the full-horizon generation
+        self.blockSize = 7*1000
+        #chunked generation (None = the full horizon is drawn at each reset)
+        self.chunkSize = None
+        self.maxCachedChunks = 2
+        #NB inverse CDF by lookup table
+        self.usePpfTable = True
+        self.tailQuantile = 1 - 1e-12
+
+    @staticmethod
+    def factorCorrelation(nStores: int, cor: float):
+        """
+        Correlation matrix of the OnLine channel (first row) and nStores offline stores: each store has correlation cor with
+        the OnLine channel and cor**2 with the other stores (one-factor structure, positive definite for |cor| < 1)
+        """
+        matrix = np.full((nStores + 1,nStores + 1),cor**2)
+        matrix[0,:] = cor
+        matrix[:,0] = cor
+        np.fill_diagonal(matrix,1)
+        return matrix
+
+    def ppf(self,column: int,u):
+        """
+        Inverse CDF of the marginal of a channel (column) applied to an array of uniforms
+        """
+        frozen,n,p = self.marginals[column]
+        if self.dists[column] != 'NB' or not self.usePpfTable:
+            return frozen.ppf(u)
+        return _tablePpf(frozen,(n,p,self.tailQuantile),u)
+
+    def transform(self,z):
+        """
+        Demand (days,channels) of the independent standard normals z (days,channels)
+        """
+        copula = stats.norm.cdf(z @ self.cholesky.T)
+        demand = np.zeros(copula.shape)
+        for i in range(len(self.channels)):
+            demand[:,i] = self.ppf(i,copula[:,i])
+        return demand
+
+    #Fixed seed reset
+    def reset(self, timeHorizon = None):
+        np.random.seed(self.seed)
+        self.generated = True
+        if timeHorizon == None:
+            timeHorizon = self.timeHorizon
+        if self.chunkSize is not None:
+            #nothing is drawn here, chunks are generated when accessed
+            self.entropy = self.seed if self.seed is not None else np.random.SeedSequence().entropy
+            self.chunks = {}
+            self.demandScenario = {k: ScenarioStream(self,i,timeHorizon) for i,k in enumerate(self.channels)}
+            return
+        #a row per channel, the scenario of a channel is a (1,timeHorizon) view
+        self.demand = np.zeros((len(self.channels),timeHorizon))
+        for start in range(0,timeHorizon,self.blockSize):
+            stop = min(start + self.blockSize,timeHorizon)
+            self.demand[:,start:stop] = self.transform(np.random.standard_normal((stop - start,len(self.channels)))).T
+        self.demandScenario = {k: self.demand[i:i + 1] for i,k in enumerate(self.channels)}
+
+    def makeScenario(self, timeHorizon, ret):
+        """
+        Scenario of the channel ret. It generates a new scenario only when resetted. Oth it only access them.
+        """
+        self.checkTimeHorizon(timeHorizon)
+        if not self.generated or self.timeHorizon != timeHorizon:
+            self.timeHorizon = timeHorizon
+            self.reset(timeHorizon = timeHorizon)
+        if ret not in self.demandScenario:
+            raise ValueError('retailer not available.')
+        return self.demandScenario[ret]
+
+    def getChunk(self,b):
+        """
+        Demand of the b-th chunk of days, as a (chunkSize,channels) array
+        """
+        b = int(b)
+        if b in self.chunks:
+            return self.chunks[b]
+        #counter-based stream: day t employs the uniforms n*t,...,n*t + n - 1 (Philox advances by blocks of 4 draws)
+        nChannels = len(self.channels)
+        start = b*self.chunkSize*nChannels
+        bitGen = np.random.Philox(self.entropy)
+        bitGen.advance(start//4)
+        rng = np.random.Generator(bitGen)
+        if start%4:
+            rng.random(start%4)
+        u = np.maximum(rng.random((self.chunkSize,nChannels)),np.finfo(float).tiny)
+        chunk = self.transform(stats.norm.ppf(u))
+        #bounded memory
+        if len(self.chunks) >= self.maxCachedChunks:
+            del self.chunks[next(iter(self.chunks))]
+        self.chunks[b] = chunk
+        return chunk
+
+
+class ScenarioStream:
+    """
+    (1,timeHorizon) array-like demand path of one channel of a chunked ScenarioGenerationCorr.
+    Days are generated chunk by chunk when accessed, e.g., scenario[0,t] or scenario[0,a:b].
+    """
+    def __init__(self, generator, column, timeHorizon):
+        self.generator = generator
+        self.column = column
+        self.shape = (1,timeHorizon)
+
+    def __getitem__(self, index):
+        if isinstance(index,tuple):
+            row,col = index
+        else:
+            row,col = index,slice(None)
+        if row != 0:
+            raise IndexError('A scenario has a single row.')
+        chunkSize = self.generator.chunkSize
+        if isinstance(col,slice):
+            start,stop,step = col.indices(self.shape[1])
+            days = np.arange(start,stop,step)
+            values = np.zeros(len(days))
+            for b in np.unique(days//chunkSize):
+                inChunk = (days//chunkSize == b)
+                values[inChunk] = self.generator.getChunk(b)[days[inChunk] - b*chunkSize,self.column]
+            return values
+        if col < 0:
+            col += self.shape[1]
+        if col < 0 or col >= self.shape[1]:
+            raise IndexError('Day out of the time horizon.')
+        return self.generator.getChunk(col//chunkSize)[col%chunkSize,self.column]
+
+    def __len__(self):
+        return 1
+
+
+def _marginal(dist, mu, sigma):
+    #frozen marginal distribution and its NB parameters (n,p), None if normal
+    if dist == 'Normal':
+        return stats.norm(mu,sigma),None,None
+    elif dist == 'NB':
+        p = mu/(sigma**2)
+        n = (mu*p)/((1 - p))
+        return stats.nbinom(n,p),n,p
+    else:
+        raise ValueError('Distribution type not found')
+
+def _tablePpf(frozen, key, u):
+    """
+    Inverse CDF of a NB marginal key = (n,p,tailQuantile) by searching the uniforms u in its CDF table (shared by all the generators)
+    """
+    if key not in ScenarioGenerationCorr.ppfTables:
+        ScenarioGenerationCorr.ppfTables[key] = frozen.cdf(np.arange(frozen.ppf(key[2]) + 1))
+    cdf = ScenarioGenerationCorr.ppfTables[key]
+    u = np.asarray(u,dtype = float)
+    values = np.searchsorted(cdf,u,side = 'left')
+    #smallest value with cdf >= u, the exact ppf in the tail and when u is (numerically) tied with the cdf
+    tol = 8*np.finfo(float).eps
+    inTable = (u > 0) & (u <= cdf[-1])
+    k = np.minimum(values,len(cdf) - 1)
+    tied = (np.abs(cdf[k] - u) <= tol) | (np.abs(u - cdf[np.maximum(k - 1,0)]) <= tol)
+    exact = ~inTable | tied
+    values = values.astype(float)
+    if np.any(exact):
+        values[exact] = frozen.ppf(u[exact])
+    return values
@@ -0,0 +1,124 @@
+import os
+import hashlib
+import numpy as np
+
+class ScenarioStore:
+    """
+    Store of scenario banks shared by any number of environments (common random numbers).
+    A bank contains, for each node of a simulation (the 'Depot' and the retailers), the demand path and the pre-drawn
+    number of LIFO clients of each day, exactly as DailySimulation draws them for a given seed and time horizon.
+    Thus, environments served by the same bank return the same results they would have computed by themselves,
+    without paying the generation cost again.
+
+    Banks are keyed by the distribution parameters and correlation of the scenario generators, the LIFO settings of the nodes,
+    the seed and the time horizon. They are kept in memory as read-only arrays or, if a directory is given, saved as .npy
+    files and memory-mapped from disk (and reused across runs).
+    Banks written in ScenarioBankFiles (see addBankFile) are served directly from the files.
+    """
+    def __init__(self, directory: str = None, maxBanks: int = None):
+        self.directory = directory
+        self.maxBanks = maxBanks #max number of banks kept in memory, None = unbounded
+        self.banks = {}
+        self.nGenerated = 0 #banks generated (not served from memory or disk)
+        self.bankFiles = []
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok = True)
+
+    def getKey(self, retailers, depot, timeHorizon, seed = None):
+        """
+        Key of the bank of a simulation (retailers dict and depot, None if there is no depot)
+        """
+        key = []
+        for name,manager in _nodes(retailers,depot).items():
+            scenarioMgr = manager.scenarioMgr
+            key.append((name, scenarioMgr.params, scenarioMgr.chunkSize, seed if seed is not None else scenarioMgr.seed, repr(manager.lifo_params)))
+        key.append(timeHorizon)
+        return repr(tuple(key))
+
+    def getBank(self, retailers, depot, timeHorizon, seed = None):
+        """
+        It returns a dict node -> {'demand': (timeHorizon,) array, 'lifo': (timeHorizon,) array} of read-only arrays.
+        If seed is None, the current seed of the scenario generators is employed.
+        """
+        nodes = _nodes(retailers,depot)
+        for manager in nodes.values():
+            if (seed if seed is not None else manager.scenarioMgr.seed) is None:
+                raise ValueError('A seed is required to share scenarios.')
+        key = self.getKey(retailers,depot,timeHorizon,seed)
+        for bankFile in self.bankFiles:
+            if key in bankFile.keys:
+                return bankFile.getBank(bankFile.seeds[bankFile.keys[key]])
+        if key in self.banks:
+            data = self.banks.pop(key) #re-inserted as the most recent
+        else:
+            fileName = None
+            if self.directory is not None:
+                fileName = os.path.join(self.directory, 'bank_' + hashlib.sha1(key.encode()).hexdigest() + '.npy')
+            if fileName is not None and os.path.exists(fileName):
+                data = np.load(fileName, mmap_mode = 'r')
+            else:
+                demand,lifo = replayScenario(retailers,depot,timeHorizon,seed)
+                data = np.zeros((2*len(nodes),timeHorizon))
+                for i,name in enumerate(nodes.keys()):
+                    data[2*i] = demand[name]
+                    data[2*i + 1] = lifo[name]
+                self.nGenerated += 1
+                if fileName is not None:
+                    np.save(fileName, data)
+                    data = np.load(fileName, mmap_mode = 'r')
+                else:
+                    data.flags.writeable = False
+        self.banks[key] = data
+        if self.maxBanks is not None and len(self.banks) > self.maxBanks:
+            del self.banks[next(iter(self.banks))]
+        return {name: {'demand': data[2*i], 'lifo': data[2*i + 1]} for i,name in enumerate(nodes.keys())}
+
+    def addBankFile(self, bankFile):
+        """
+        ScenarioBankFile (or its file name) whose banks are served zero-copy
+        """
+        if isinstance(bankFile, str):
+            from .ScenarioBankFile import ScenarioBankFile
+            bankFile = ScenarioBankFile(bankFile)
+        self.bankFiles.append(bankFile)
+
+    def clear(self):
+        self.banks = {}
+
+
+def _nodes(retailers, depot):
+    #nodes in the order DailySimulation steps them
+    nodes = {}
+    if depot != None:
+        nodes['Depot'] = depot
+    for k in retailers.keys():
+        nodes[k] = retailers[k]
+    return nodes
+
+def replayScenario(retailers, depot, timeHorizon, seed = None):
+    """
+    It replays the random number consumption of DailySimulation.reset and DailySimulation.step.
+    It returns two dict node -> (timeHorizon,) arrays: the demand and the number of LIFO clients of each day.
+    If seed is not None, it is set to all the scenario generators.
+    """
+    nodes = _nodes(retailers,depot)
+    if seed is not None:
+        for manager in nodes.values():
+            manager.scenarioMgr.setSeed(seed)
+    #scenario generation, the same calls of DailySimulation.reset (a shared generator is drawn once)
+    for k in retailers.keys():
+        retailers[k].scenarioMgr.generated = False
+    for k in retailers.keys():
+        retailers[k].scenarioMgr.makeScenario(timeHorizon,retailers[k].scenarioName)
+    demand = {}
+    lifo = {}
+    for name,manager in nodes.items():
+        #as depot, it can only be the online
+        scenario = manager.scenarioMgr.makeScenario(timeHorizon,'OnLine' if name == 'Depot' else manager.scenarioName)
+        demand[name] = np.array(scenario[0,:],dtype = float)
+        lifo[name] = np.zeros(timeHorizon)
+    #LIFO clients, the same calls of the daily steps
+    for t in range(1,timeHorizon):
+        for name,manager in nodes.items():
+            lifo[name][t] = int(manager.simulateLIFO(np.rint(demand[name][t])))
+    return demand,lifo
@@ -2,6 +2,147 @@
 Classes to manage statistics
 """
 import numpy as np
+from collections import deque
+from scipy.stats import t as student
+
+class ConvergenceTracker:
+    """
+    Incremental statistics of a sequence (the average profit history): min and max over a sliding window
+    by monotonic deques and a running mean of the whole sequence, O(1) amortized per value.
+    NaN values are ignored by min and max (as np.nanmin/np.nanmax) and propagate to the mean (as np.mean).
+    """
+    def __init__(self, window: int):
+        self.window = window
+        self.clear()
+
+    def clear(self):
+        self.n = 0
+        self.total = 0
+        self.maxQueue = deque() #(index,value), decreasing values
+        self.minQueue = deque() #(index,value), increasing values
+
+    def update(self, value):
+        self.n += 1
+        self.total += value
+        if value == value: #not NaN
+            while self.maxQueue and self.maxQueue[-1][1] <= value:
+                self.maxQueue.pop()
+            self.maxQueue.append((self.n,value))
+            while self.minQueue and self.minQueue[-1][1] >= value:
+                self.minQueue.pop()
+            self.minQueue.append((self.n,value))
+        #values out of the window
+        while self.maxQueue and self.maxQueue[0][0] <= self.n - self.window:
+            self.maxQueue.popleft()
+        while self.minQueue and self.minQueue[0][0] <= self.n - self.window:
+            self.minQueue.popleft()
+
+    def setWindow(self, window: int, values = []):
+        #values: the sequence so far (or at least its last window values) to rebuild the sliding window
+        self.window = window
+        self.maxQueue = deque()
+        self.minQueue = deque()
+        tail = values[max(0,len(values) - window):]
+        total = self.total
+        self.n -= len(tail)
+        for value in tail:
+            self.update(value)
+        self.total = total
+
+    #state as a flat vector (see DailySimulation.snapshot): n, total and the (index,value) pairs of the queues, padded to the window
+    def getStateSize(self):
+        return 4 + 4*int(self.window)
+
+    def saveState(self, buffer):
+        window = int(self.window)
+        buffer[:4] = [self.n,self.total,len(self.maxQueue),len(self.minQueue)]
+        for i,queue in enumerate([self.maxQueue,self.minQueue]):
+            if queue:
+                buffer[4 + 2*i*window:4 + 2*i*window + 2*len(queue)] = [value for pair in queue for value in pair]
+
+    def loadState(self, buffer):
+        window = int(self.window)
+        self.n = int(buffer[0])
+        self.total = buffer[1].item()
+        for i,size in enumerate(buffer[2:4].astype(int)):
+            pairs = buffer[4 + 2*i*window:4 + 2*i*window + 2*size].reshape(-1,2)
+            queue = deque(zip(pairs[:,0].astype(int).tolist(),pairs[:,1].tolist()))
+            if i == 0:
+                self.maxQueue = queue
+            else:
+                self.minQueue = queue
+
+    def getMax(self):
+        return self.maxQueue[0][1] if self.maxQueue else np.nan
+
+    def getMin(self):
+        return self.minQueue[0][1] if self.minQueue else np.nan
+
+    def getMean(self):
+        return self.total / self.n if self.n > 0 else np.nan
+
+class BatchMeans:
+    """
+    Non-overlapping batch means of a sequence (the daily cash flows), updated incrementally.
+    Values are grouped in batches of batchSize values; when 2*nBatches batches are complete, adjacent batches are merged
+    (nBatches batches of double size), thus the batches grow with the run and their means become nearly independent.
+    The standard error of the overall mean is the standard deviation of the batch means over the square root of their number.
+    """
+    def __init__(self, nBatches: int = 32, batchSize: int = 7):
+        self.nBatches = nBatches
+        self.initialBatchSize = batchSize
+        self.clear()
+
+    def clear(self):
+        self.batchSize = self.initialBatchSize
+        self.batches = [] #means of the complete batches
+        self.total = 0 #current batch
+        self.count = 0
+        self.n = 0
+        self.sum = 0
+        self.stdError = np.nan
+
+    def update(self, value):
+        self.n += 1
+        self.sum += value
+        self.total += value
+        self.count += 1
+        if self.count == self.batchSize:
+            self.batches.append(self.total / self.batchSize)
+            self.total = 0
+            self.count = 0
+            if len(self.batches) == 2*self.nBatches:
+                self.batches = [(self.batches[2*i] + self.batches[2*i + 1])/2 for i in range(self.nBatches)]
+                self.batchSize *= 2
+            #the standard error changes only when a batch is complete
+            self.stdError = np.std(self.batches,ddof = 1)/np.sqrt(len(self.batches)) if len(self.batches) > 1 else np.nan
+
+    def getMean(self):
+        return self.sum / self.n if self.n > 0 else np.nan
+
+    #state as a flat vector (see DailySimulation.snapshot): counters, sums and the batch means, padded to 2*nBatches
+    def getStateSize(self):
+        return 7 + 2*self.nBatches
+
+    def saveState(self, buffer):
+        buffer[:7] = [self.batchSize,self.total,self.count,self.n,self.sum,self.stdError,len(self.batches)]
+        buffer[7:7 + len(self.batches)] = self.batches
+
+    def loadState(self, buffer):
+        self.batchSize = int(buffer[0])
+        self.total,self.sum,self.stdError = buffer[1].item(),buffer[4].item(),buffer[5].item()
+        self.count,self.n = int(buffer[2]),int(buffer[3])
+        self.batches = buffer[7:7 + int(buffer[6])].tolist()
+
+    def getStandardError(self):
+        return self.stdError
+
+    def getHalfWidth(self, confidence: float = 0.95):
+        #half-width of the confidence interval of the mean (Student's t with batches - 1 degrees of freedom)
+        if len(self.batches) < 2:
+            return np.nan
+        return student.ppf((1 + confidence)/2,len(self.batches) - 1)*self.stdError
+
 
 class StatManager:
     #additional values for possible transient periods
@@ -39,9 +180,24 @@ class StatManager:
         #Terminate the simulation
         self.eps = 0.0002 #Bug found, a zero was missing in its previous version
         self.window = 35 #min window as default 5 weeks
-        # cashFlowHistory
-        self.cashFlowHist = [] 
-        self.avgProfitHist = []
+        #window min/max and mean of avgProfitHist for the stopping rule
+        self.tracker = ConvergenceTracker(self.window)
+        #stopping rule: 'window' (min-max of the average profit within eps over the window) or 'batchMeans' (confidence interval)
+        self.stoppingRule = 'window'
+        self.relWidth = 0.005 #target half-width w.r.t. the average profit
+        self.confidence = 0.95
+        #batch means of the daily cash flows (standard error of the average profit in any stopping rule)
+        self.batchMeans = BatchMeans()
+        #moments of the daily cash flows
+        self.cashFlowMean = 0
+        self.cashFlowM2 = 0
+        #cashFlow and average profit histories: preallocated buffers sized from the time horizon
+        #'full' records each day, 'downsample' one day every historyStep, 'summary' only the moments
+        self.historyMode = 'full'
+        self.historyStep = 1
+        self._cashFlowHist = np.zeros(0)
+        self._avgProfitHist = np.zeros(0)
+        self.nHist = 0
         #Boolean if Depot
         self.depot = Depot
 
@@ -60,8 +216,78 @@ class StatManager:
         self.TotalCost = 0
         self.myClock = 0
         self.n = 0
-        self.avgProfitHist = []
-        self.cashFlowHist = []
+        self.cashFlowMean = 0
+        self.cashFlowM2 = 0
+        self.nHist = 0
+        self.tracker.clear()
+        self.batchMeans.clear()
+
+    #state as a flat vector (see DailySimulation.snapshot): clock, counters, per retailer totals, tracker and batch means.
+    #The histories are append-only: their length is restored, the recorded days are not copied
+    def _totals(self):
+        return [self.TotalSold,self.TotalScrapped,self.TotalProfit,self.profit,self.costs,self.totLost,self.nStockOut]
+
+    def getStateSize(self):
+        return 6 + 7*len(self.ret_list) + 1 + self.tracker.getStateSize() + self.batchMeans.getStateSize()
+
+    def saveState(self, buffer):
+        buffer[:6] = [self.myClock,self.n,self.TotalCost,self.cashFlowMean,self.cashFlowM2,self.nHist]
+        nRet = len(self.ret_list)
+        for i,totals in enumerate(self._totals()):
+            buffer[6 + i*nRet:6 + (i + 1)*nRet] = [totals[k] for k in self.ret_list]
+        start = 6 + 7*nRet
+        buffer[start] = self.TotalScrapped.get('Depot',0)
+        tracker = start + 1 + self.tracker.getStateSize()
+        self.tracker.saveState(buffer[start + 1:tracker])
+        self.batchMeans.saveState(buffer[tracker:])
+
+    def loadState(self, buffer):
+        self.myClock,self.n,self.nHist = int(buffer[0]),int(buffer[1]),int(buffer[5])
+        self.TotalCost,self.cashFlowMean,self.cashFlowM2 = buffer[2:5].tolist()
+        nRet = len(self.ret_list)
+        for i,totals in enumerate(self._totals()):
+            for k,value in zip(self.ret_list,buffer[6 + i*nRet:6 + (i + 1)*nRet].tolist()):
+                totals[k] = value
+        start = 6 + 7*nRet
+        self.TotalScrapped['Depot'] = buffer[start].item()
+        tracker = start + 1 + self.tracker.getStateSize()
+        self.tracker.loadState(buffer[start + 1:tracker])
+        self.batchMeans.loadState(buffer[tracker:])
+
+    #cashFlow and average profit histories (read-only views of the recorded days)
+    @property
+    def cashFlowHist(self):
+        hist = self._cashFlowHist[:self.nHist]
+        hist.flags.writeable = False
+        return hist
+    @property
+    def avgProfitHist(self):
+        hist = self._avgProfitHist[:self.nHist]
+        hist.flags.writeable = False
+        return hist
+
+    def setHistory(self, mode: str = 'full', step: int = 1):
+        """
+        mode: 'full' records the cash flow and the average profit of each day, 'downsample' one day every step days,
+        'summary' does not record them (only the mean and the variance of the cash flows are kept, see getCashFlowMoments).
+        The stopping rule does not depend on the recorded history.
+        """
+        if mode not in ['full','downsample','summary']:
+            raise ValueError('History mode not available.')
+        if step < 1:
+            raise ValueError('Please set a valid step.')
+        self.historyMode = mode
+        self.historyStep = step if mode == 'downsample' else 1
+        self.nHist = 0
+        self.allocateHistory()
+
+    def allocateHistory(self):
+        #buffers are allocated once per time horizon and reused by the following runs
+        size = 0 if self.historyMode == 'summary' else self.TimeHorizon // self.historyStep + 1
+        if len(self._cashFlowHist) != size:
+            self.nHist = min(self.nHist,size)
+            self._cashFlowHist = np.concatenate([self._cashFlowHist[:self.nHist],np.zeros(size - self.nHist)])
+            self._avgProfitHist = np.concatenate([self._avgProfitHist[:self.nHist],np.zeros(size - self.nHist)])
 
     #Set time horizon
     def setTimeHorizon(self, TimeHorizon):
@@ -70,6 +296,7 @@ class StatManager:
         self.TimeHorizon = TimeHorizon
         self.FirstTimeBucket = self.Head + 1
         self.LastTimeBucket = TimeHorizon
+        self.allocateHistory()
         
     #Set transient Head and Tail to discard in computing statistics
     def setHead(self, Head):
@@ -81,11 +308,29 @@ class StatManager:
         if window <= 0:
             raise ValueError('Window must be a positive value.')
         self.window = window
+        #the window can be rebuilt only from a full history, otherwise it is filled again in window days
+        self.tracker.setWindow(window,self.avgProfitHist if self.historyMode == 'full' else [])
     #width of the average w.r.t. the average itself
     def setEndEps(self,eps: float):
         if eps >= 1 or eps <= 0:
             raise ValueError('Please set a valid eps between 0 and 1.')
         self.eps = eps
+
+    def setStoppingRule(self, rule: str = 'window', relWidth: float = 0.005, confidence: float = 0.95, nBatches: int = 32, batchSize: int = 7):
+        """
+        'window': the average profit is stable (max - min <= eps * mean) over the window (default)
+        'batchMeans': the confidence interval (at confidence level) of the average daily cash flow, by batch means, has a half-width
+                      <= relWidth * |average profit|. At least nBatches batches (of batchSize days at least) are required.
+        In both cases the run lasts minN days at least and stops if the profit is clearly negative.
+        """
+        if rule not in ['window','batchMeans']:
+            raise ValueError('Stopping rule not available.')
+        if relWidth <= 0 or confidence <= 0 or confidence >= 1:
+            raise ValueError('Please set a valid relWidth and confidence.')
+        self.stoppingRule = rule
+        self.relWidth = relWidth
+        self.confidence = confidence
+        self.batchMeans = BatchMeans(nBatches,batchSize)
     
     #Update functions for time steps and daily profits
 
@@ -131,15 +376,26 @@ class StatManager:
                     self.TotalCost += self.costs[k]
                     costs += self.costs[k]
                     self.costs[k] = 0#re-initialization of the costs tmp variable
-            #re_initialize tmpProfits and sum
+            #re_initialize tmpProfits and sum (total revenue as in getTotalRevenue, without a further loop)
+            revenue = 0
             for k in self.ret_list:
                 dayProfits += self.profit[k]
                 self.profit[k] = 0 #re-initialization of the profit tmp variable
+                revenue += self.TotalProfit[k]
             #compute cashFlow
             cashFlow = dayProfits - costs
             self.n +=1 #cashFlows statistics counter
-            self.avgProfitHist.append(self.getAverageProfit())
-            self.cashFlowHist.append(cashFlow)
+            avgProfit = (revenue - self.TotalCost) / self.n #getAverageProfit
+            self.tracker.update(avgProfit)
+            #Welford's update of the moments
+            delta = cashFlow - self.cashFlowMean
+            self.cashFlowMean += delta / self.n
+            self.cashFlowM2 += delta * (cashFlow - self.cashFlowMean)
+            self.batchMeans.update(cashFlow)
+            if self.historyMode != 'summary' and self.n % self.historyStep == 0:
+                self._cashFlowHist[self.nHist] = cashFlow
+                self._avgProfitHist[self.nHist] = avgProfit
+                self.nHist += 1
             return cashFlow
         else:
             return 0 # to return a reward for the first time-bucket
@@ -161,17 +417,35 @@ class StatManager:
 
 
     def checkIfDone(self): #is the average profit stable over the window?
+        if self.stoppingRule == 'batchMeans':
+            return self.checkConfidenceInterval()
         if(self.myClock >= self.minN and self.n >= self.window):
-            if np.all(np.array(self.avgProfitHist[self.n - self.window:self.n])<0): #we assume that makes no sense to have a negative profit strategy
+            #window statistics are tracked incrementally, O(1) per day
+            up = self.tracker.getMax()
+            low = self.tracker.getMin()
+            if up < 0: #we assume that makes no sense to have a negative profit strategy
                 return True 
-            up = np.nanmax(self.avgProfitHist[self.n - self.window:self.n])
-            low = np.nanmin(self.avgProfitHist[self.n - self.window:self.n])
-            return ( abs(up-low) <= self.eps*np.mean(self.avgProfitHist))
+            return ( abs(up-low) <= self.eps*self.tracker.getMean())
+        else:
+            return False
+    def checkConfidenceInterval(self): #is the confidence interval of the average profit narrow enough?
+        if self.myClock >= self.minN and len(self.batchMeans.batches) >= self.batchMeans.nBatches:
+            mean = self.batchMeans.getMean()
+            halfWidth = self.batchMeans.getHalfWidth(self.confidence)
+            if mean + halfWidth < 0: #we assume that makes no sense to have a negative profit strategy
+                return True
+            return halfWidth <= self.relWidth*abs(mean)
         else:
             return False
+    def getStandardError(self):
+        #standard error of the average profit (batch means)
+        return self.batchMeans.getStandardError()
     #Main performance metrics
     def getAverageProfit(self):
         return (self.getTotalRevenue() - self.getTotalPurchaseCost() ) / self.n
+    def getCashFlowMoments(self):
+        #mean and (sample) variance of the daily cash flows
+        return self.cashFlowMean, (self.cashFlowM2 / (self.n - 1) if self.n > 1 else np.nan)
     def getAverageUnmetClients(self):
         totLostCum = 0
         for k in self.ret_list:
@@ -4,35 +4,49 @@ Orders manager according to the lead times. Each product needs its SupplyManager
 import numpy as np
 
 class SupplyManager:
-
+    """
+    The pipeline of orders is stored as a ring buffer of LeadTime+1 rows written twice (mirrored), so that
+    delivering is a pointer rotation and OnOrder (next delivery first) is always a zero-copy (read-only) view.
+    """
     
     def __init__(self,LeadTime,ShelfLife = np.nan):
         self.LeadTime = LeadTime
         self.ShelfLife = ShelfLife
-        if np.isnan(self.ShelfLife):
-             self.OnOrder = np.zeros(LeadTime+1) #Everything fresh
-        else:
-            self.OnOrder = np.zeros([LeadTime+1,ShelfLife]) #Retailers mixed ages
+        self.clearState()
     #Clear queue of orders
     def clearState(self):
     #If lead time is zero, use one position as a placeholder
         if np.isnan(self.ShelfLife):
-             self.OnOrder = np.zeros(self.LeadTime+1) #Depot everthing fresh
+             self._ring = np.zeros(2*(self.LeadTime+1)) #Depot everthing fresh
         else:
-            self.OnOrder = np.zeros([self.LeadTime+1,self.ShelfLife]) #Retailers mixed ages
+            self._ring = np.zeros([2*(self.LeadTime+1),self.ShelfLife]) #Retailers mixed ages
+        self._head = 0
+    #state as a flat vector (see DailySimulation.snapshot): the ring buffer and its head
+    def getStateSize(self):
+        return self._ring.size + 1
+    def saveState(self,buffer):
+        buffer[:-1] = self._ring.reshape(-1)
+        buffer[-1] = self._head
+    def loadState(self,buffer):
+        self._ring[...] = buffer[:-1].reshape(self._ring.shape)
+        self._head = int(buffer[-1])
+    #Ordered view of the queue
+    @property
+    def OnOrder(self):
+        view = self._ring[self._head:self._head + self.LeadTime + 1]
+        view.flags.writeable = False
+        return view
     #Deliver the next supply order
     def deliverSupply(self):
-        Delivery = self.OnOrder[0].copy()
-        #now shift up
-        for k in range(self.LeadTime):
-            self.OnOrder[k] = self.OnOrder[k+1].copy()
-        if np.isnan(self.ShelfLife):
-            self.OnOrder[-1] = 0
-        else:
-            self.OnOrder[-1] = np.zeros(self.ShelfLife)
+        Delivery = self._ring[self._head].copy()
+        #the delivered slot becomes the last (empty) one
+        self._ring[self._head] = 0
+        self._ring[self._head + self.LeadTime + 1] = 0
+        self._head = (self._head + 1)%(self.LeadTime + 1)
         return Delivery
     # Update Inventory
     def GetOrder(self,OrderSize):
-        self.OnOrder[-1] = OrderSize
+        last = self._head + self.LeadTime
+        self._ring[last] = OrderSize
+        self._ring[(last + self.LeadTime + 1)%(2*(self.LeadTime + 1))] = OrderSize
         
-
@@ -0,0 +1,236 @@
+"""
+Structured debug trace of the simulation
+"""
+import sys
+import numpy as np
+
+class TraceManager:
+    """
+    Per-day events of the managers (delivered, LIFO/FIFO split, sold, scrapped, dispatched per age, cash flow, ...) recorded
+    in a columnar buffer: one table per node ('Depot', the retailers and 'Simulation' for the cash flow), one row per day,
+    each column a preallocated array (doubled when full).
+    The managers record only when a trace is attached (setTrace) and the day is within [firstDay, lastDay],
+    otherwise the simulation does not pay anything but a check per step.
+    replay prints the days in the format of the former flagPrint output; with echo, each day is printed as soon as it ends.
+    """
+    def __init__(self, capacity: int = 7*100, firstDay: int = 1, lastDay: int = None, echo: bool = False):
+        self.capacity = capacity
+        self.firstDay = firstDay
+        self.lastDay = lastDay
+        self.echo = echo
+        self.clear()
+
+    def clear(self):
+        self.tables = {}
+        self.metrics = {}
+        self.day = 0
+        self.active = False
+
+    def setDay(self, day: int):
+        #the managers record the day only if active
+        self.day = day
+        self.active = (day >= self.firstDay) and (self.lastDay is None or day <= self.lastDay)
+
+    def record(self, node: str, **row):
+        if node not in self.tables:
+            self.tables[node] = _TraceTable(self.capacity)
+        self.tables[node].append(self.day, row)
+
+    def endDay(self, cashFlow: float):
+        if not self.active:
+            return
+        self.record('Simulation', cashFlow = cashFlow)
+        if self.echo:
+            print(self.format(self.day))
+
+    def setMetrics(self, metrics: dict):
+        #final metrics of the run
+        self.metrics = metrics
+        if self.echo:
+            print(self.formatMetrics())
+
+    def getTable(self, node: str):
+        """
+        It returns the columns of the node (dict column -> array with a row per recorded day, 'day' included)
+        """
+        table = self.tables[node]
+        return {key: column[:table.n] for key,column in table.columns.items()}
+
+    def getDays(self):
+        return self.tables['Simulation'].columns['day'][:self.tables['Simulation'].n] if 'Simulation' in self.tables else np.zeros(0,dtype = int)
+
+    def replay(self, first: int = None, last: int = None, file = None):
+        """
+        It prints the recorded days in [first, last] (all the days if None), and the final metrics if the run ended
+        """
+        file = file if file is not None else sys.stdout
+        for day in self.getDays():
+            if (first is None or day >= first) and (last is None or day <= last):
+                print(self.format(day), file = file)
+        if self.metrics and (last is None or last >= self.getDays()[-1]):
+            print(self.formatMetrics(), file = file)
+
+    def format(self, day: int):
+        #text of a recorded day
+        lines = []
+        for node,table in self.tables.items():
+            row = table.find(day)
+            if row is None:
+                continue
+            values = table.getRow(row)
+            if node == 'Simulation':
+                lines.append(_line('CashFlow of the day ', values['cashFlow']))
+                lines.append(_line('State observation: ', self.getState(day)))
+            elif 'ordered' in values:
+                lines += _formatDepot(values)
+            else:
+                lines += _formatRetailer(node, values)
+        return '\n'.join(lines)
+
+    def getState(self, day: int):
+        #observation at the end of a recorded day
+        state = {}
+        for node,table in self.tables.items():
+            row = table.find(day)
+            if node != 'Simulation' and row is not None:
+                state[node] = {'inventory': table.columns['closing'][row]}
+                if 'pipeline' in table.columns:
+                    state[node]['ordered' if node == 'Depot' else 'dispatched'] = table.columns['pipeline'][row]
+        return state
+
+    def formatMetrics(self):
+        #as the former prints: the averages first, then a line per stock-out probability
+        summary = []
+        lines = []
+        for key,value in self.metrics.items():
+            if key.startswith('stockout probability retailer '):
+                k = key[len('stockout probability retailer '):]
+                if k == 'OnLine(Depot)':
+                    lines.append(_line('stockout probability retailer: OnLine(Depot) = ', value))
+                else:
+                    lines.append(_line('stockout probability retailer: ', k, ' = ', value))
+            else:
+                summary += [('' if summary else 'Simulation metrics:') + '\n\t' + key + ' = ', value]
+        return '\n'.join([_line(*summary)] + lines)
+
+
+class _TraceTable:
+    """
+    Columns of a node: preallocated arrays with a row per day, created at the first record.
+    Integer values get an integer column; a column receiving a float after integers becomes a float column
+    and remembers its integer rows (integral), thus getRow returns the values as they were recorded.
+    """
+    def __init__(self, capacity: int):
+        self.capacity = max(capacity,1)
+        self.n = 0
+        self.columns = {}
+        self.integral = {}
+
+    def append(self, day: int, row: dict):
+        if self.n == self.capacity:
+            self.capacity *= 2
+            for key,column in self.columns.items():
+                grown = np.zeros((self.capacity,) + column.shape[1:], dtype = column.dtype)
+                grown[:self.n] = column[:self.n]
+                self.columns[key] = grown
+            for key,mask in self.integral.items():
+                grown = np.zeros(self.capacity, dtype = bool)
+                grown[:self.n] = mask[:self.n]
+                self.integral[key] = grown
+        if self.n == 0 and not self.columns:
+            self.columns['day'] = np.zeros(self.capacity, dtype = int)
+            for key,value in row.items():
+                self.columns[key] = np.zeros((self.capacity,) + np.shape(value), dtype = _dtype(value))
+        self.columns['day'][self.n] = day
+        for key,value in row.items():
+            column = self.columns[key]
+            dtype = _dtype(value)
+            if dtype == float and column.dtype != float:
+                #e.g., a cash flow of 0 out of the accounting window, then floats
+                self.integral[key] = np.zeros(self.capacity, dtype = bool)
+                self.integral[key][:self.n] = True
+                self.columns[key] = column = column.astype(float)
+            column[self.n] = value
+            if key in self.integral:
+                self.integral[key][self.n] = (dtype == int)
+        self.n += 1
+
+    def getRow(self, row: int):
+        #values of a row, the integer ones as integers
+        values = {}
+        for key,column in self.columns.items():
+            value = column[row]
+            if key in self.integral and self.integral[key][row]:
+                value = value.astype(int)
+            values[key] = value
+        return values
+
+    def find(self, day: int):
+        #row of the day (days are recorded in increasing order), None if not recorded
+        if self.n == 0:
+            return None
+        row = np.searchsorted(self.columns['day'][:self.n],day)
+        return row if row < self.n and self.columns['day'][row] == day else None
+
+
+def _dtype(value):
+    #int for integer values, float otherwise
+    return int if np.issubdtype(np.asarray(value).dtype, np.integer) else float
+
+def _line(*values):
+    #as print(*values)
+    return ' '.join(str(value) for value in values)
+
+def _formatDepot(values: dict):
+    day = values['day']
+    lines = [_line('Day', day), _line('\t', values['delivered'], ' items have just arrived.')]
+    lines += ['\nInventory depot before dispatch:', 'Product Stored']
+    for i,items in enumerate(values['inventory']):
+        lines.append(_line('\t', items, 'items with ', i + 1, 'Residual shelf life'))
+    lines.append(_line('Oredered by Depot: ', values['ordered']))
+    for key in values.keys():
+        if key.startswith('dispatched_'): #totals in totDispatched_k
+            k = key[len('dispatched_'):]
+            lines.append(_line(values[key], ' units of product dispatched to retailer: ', k))
+            lines.append(_line(values['tot' + key[0].upper() + key[1:]], ' TOTAL of units of product dispatched to retailer: ', k))
+    lines.append(_line('Total scrapped so far', values['scrappedSoFar'])) #before the scrap of the day
+    lines.append(_line('Cost of the day ', values['cost']))
+    lines.append(_line('Total cost so far ', values['totCost']))
+    lines.append(_line('-------------DAY ', day - 1, '  ENDS -------'))
+    lines.append('------------------New day Begins------------------------')
+    lines += [_line('\n Day', day, '\n inventory depot:'), 'Product Stored']
+    for i,items in enumerate(values['stock']):
+        lines.append(_line('\t', items, 'items with ', i + 1, 'Residual shelf life'))
+    lines.append(_line('Demand: ', values['demand']))
+    lines.append(_line('Scrapped by Depot: ', values['scrapped']))
+    lines.append(_line(' Depot:\nSold:  ', values['sold'], ' Scrapped: ', values['scrapped']))
+    lines.append(_line('No purchase: ', values['lost']))
+    lines.append(_line('Total sold so far', values['totSold']))
+    lines.append(_line('Profit of the day ', values['profit']))
+    lines.append('------------Night at the Depot-------------')
+    return lines
+
+def _formatRetailer(name: str, values: dict):
+    lines = ['------------------------------------------', _line('RETAILER: ', name)]
+    lines += [_line('\nDay', values['day'], '\nInventory:'), 'Product Stored']
+    for i,items in enumerate(values['inventory'][:-1]):
+        lines.append(_line('\t', items, 'items with ', i + 1, 'Residual shelf life'))
+    lines += [_line(' shipped by depot to retailer ', name, ':'), 'Waiting for: ']
+    for i,items in enumerate(values['onOrder']):
+        if i != 0:
+            lines.append(_line('\t', np.rint(items), ' items, expected in', i, 'days'))
+        else:
+            lines.append(_line('\t', np.rint(items), ' items have just arrived.'))
+    lines.append(_line('Demand: ', values['demand']))
+    lines.append(_line('Lifo = ', int(values['lifo']), ' Fifo = ', int(values['fifo'])))
+    lines.append(_line('Sold Lifo = ', values['lifoSold'], ' Sold Fifo = ', values['fifoSold']))
+    lines.append(_line(' Dispatched/Ordered(if no depot) product: ', values['dispatched'], ' Sold:  ', values['sold'], ' Scrapped: ', values['scrapped']))
+    lines.append(_line('No purchase: ', values['lost']))
+    lines.append(_line('Total dispatched by the depot/orederd by retailer so far ', values['totDispatched']))
+    lines.append(_line('Total scrapped so far', values['totScrapped']))
+    lines.append(_line('Total sold so far', values['totSold']))
+    lines.append(_line('Profit of the day ', values['profit']))
+    lines.append('------------------------------------------')
+    if 'cost' in values:
+        lines.append(_line('Cost of the day retailer', name, ' = ', values['cost']))
+    return lines
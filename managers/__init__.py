@@ -1,15 +1,23 @@
 from .InventoryManager import InventoryManager
-from .ScenarioGeneratorRandom import ScenarioGenerationCorr
-from .StatManager import StatManager
+from .ScenarioGeneratorRandom import ScenarioGenerationCorr, ScenarioGenerationMulti
+from .StatManager import StatManager, ConvergenceTracker
 from .SupplyManager import SupplyManager
 from .DepotManager import DepotManager
 from .RetailManager import RetailManager
+from .ScenarioStore import ScenarioStore
+from .ScenarioBankFile import ScenarioBankFile
+from .TraceManager import TraceManager
 
 __all__ = [
     "SupplyManager",
     "StatManager",
+    "ConvergenceTracker",
     "ScenarioGenerationCorr",
+    "ScenarioGenerationMulti",
     "InventoryManager",
     "DepotManager",
-    "RetailManager"
+    "RetailManager",
+    "ScenarioStore",
+    "ScenarioBankFile",
+    "TraceManager"
 ]
\ No newline at end of file
@@ -0,0 +1,119 @@
+"""
+Memoization of the policy evaluations, in memory and on disk
+"""
+import os
+import json
+import hashlib
+
+class EvaluationCache:
+    """
+    Metrics of the runs of a policy (one per seed) keyed by the configuration, the policy type and flags (order and dispatch
+    policies, internal issuing, critical online, 2k, rationing), the effective parameters of the candidate (policy.effectiveParams,
+    e.g., the rounded order-up-to levels), the seed and the time horizon. Thus, repeated candidates and the ones taking the same
+    decisions are simulated once (see PolicyEvaluator).
+
+    The most recently used maxEntries runs are kept in memory. If a directory is given, each run is also saved as a JSON file
+    and reused across runs. Keys include the version of the simulator: by default a hash of the sources of managers, envs,
+    policies and optimization (simulatorVersion), otherwise the version tag given by the caller (e.g., a git commit).
+    Thus runs of another simulator are never served; their files can be deleted.
+    """
+    #hash of the sources, computed once per process
+    sourceHash = None
+
+    def __init__(self, maxEntries: int = 100000, directory: str = None, version: str = None):
+        self.maxEntries = maxEntries #None = unbounded
+        self.directory = directory
+        self.version = version if version is not None else EvaluationCache.simulatorVersion()
+        self.entries = {}
+        self.nHits = 0
+        self.nMisses = 0
+        if self.directory is not None:
+            os.makedirs(self.directory, exist_ok = True)
+
+    @staticmethod
+    def simulatorVersion():
+        """
+        Hash of the sources (.py files) of the packages managers, envs, policies and optimization
+        """
+        if EvaluationCache.sourceHash is None:
+            root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+            digest = hashlib.sha1()
+            for package in ['managers','envs','policies','optimization']:
+                for name in sorted(os.listdir(os.path.join(root, package))):
+                    if name.endswith('.py'):
+                        digest.update((package + '/' + name).encode())
+                        with open(os.path.join(root, package, name), 'rb') as fp:
+                            digest.update(fp.read())
+            EvaluationCache.sourceHash = digest.hexdigest()
+        return EvaluationCache.sourceHash
+
+    @staticmethod
+    def configurationKey(*settings):
+        """
+        Hash of any JSON-serializable description of the configuration (e.g., store setting, producer, depot flag, correlation)
+        """
+        return hashlib.sha1(json.dumps(settings, sort_keys = True, default = str).encode()).hexdigest()
+
+    @staticmethod
+    def policyFlags(policy):
+        #type and options of a policy that change its decisions
+        flags = [type(policy).__name__]
+        for name in ['orderPolicy','dispatchPolicy','issuingPolicy','criticalToServe','twoKdispatch','rationing','bsp_ret']:
+            if hasattr(policy, name):
+                value = getattr(policy, name)
+                flags.append((name, sorted(value) if isinstance(value, list) else value))
+        if hasattr(policy, 'priorities'):
+            flags.append(('priorities', [int(i) for i in policy.priorities]))
+        return tuple(flags)
+
+    def getKey(self, configuration: str, policy, x, seed, timeHorizon: int):
+        """
+        Key of the run of the parameters x of policy (its effective parameters if available) on a seed
+        """
+        params = policy.effectiveParams(x) if hasattr(policy, 'effectiveParams') else tuple(float(v) for v in x)
+        return repr((self.version, configuration, self.policyFlags(policy), params, seed, timeHorizon))
+
+    def get(self, key: str):
+        """
+        It returns the metrics of a run, None if it is not cached
+        """
+        if key in self.entries:
+            metrics = self.entries.pop(key) #re-inserted as the most recent
+        else:
+            metrics = None
+            fileName = self._fileName(key)
+            if fileName is not None and os.path.exists(fileName):
+                with open(fileName, 'r') as fp:
+                    entry = json.load(fp)
+                if entry['key'] == key:
+                    metrics = entry['metrics']
+            if metrics is None:
+                self.nMisses += 1
+                return None
+        self.nHits += 1
+        self._insert(key, metrics)
+        return metrics
+
+    def put(self, key: str, metrics: dict):
+        #metrics: JSON-serializable dict
+        self._insert(key, metrics)
+        fileName = self._fileName(key)
+        if fileName is not None:
+            #written aside and renamed, thus concurrent runs never read a partial file
+            with open(fileName + '.tmp' + str(os.getpid()), 'w') as fp:
+                json.dump({'key': key, 'metrics': metrics}, fp)
+            os.replace(fileName + '.tmp' + str(os.getpid()), fileName)
+
+    def clear(self):
+        #memory only, the files are kept
+        self.entries = {}
+
+    def _insert(self, key: str, metrics: dict):
+        self.entries[key] = metrics
+        if self.maxEntries is not None and len(self.entries) > self.maxEntries:
+            del self.entries[next(iter(self.entries))]
+
+    def _fileName(self, key: str):
+        if self.directory is None:
+            return None
+        return os.path.join(self.directory, 'eval_' + hashlib.sha1(key.encode()).hexdigest() + '.json')
@@ -0,0 +1,152 @@
+"""
+Evaluation of batches of policy parameters over a pool of processes
+"""
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from envs import buildSimulation
+from managers import ScenarioStore
+from .EvaluationCache import EvaluationCache
+from policies.policyFactory import buildPolicy
+
+#warm environment and policy of a worker process (built once by _initWorker)
+_worker = None
+
+class PolicyEvaluator:
+    """
+    It evaluates batches of candidate parameters x of a policy class (e.g., SingleRetailerDepotPolicy or SingleEchCOP_BSP)
+    on a configuration. Each worker process builds the managers, the DailySimulation and the policy once,
+    then each candidate only requires setParameters and one reset per seed.
+    Each candidate is simulated on the same seeds (common random numbers) in the same order, thus the results
+    do not depend on the number of workers nor on the batch a candidate belongs to.
+    setup is the list of (method name, args) calls of the policy after its initialization (see policies.policyFactory.policySpec).
+    If relWidth is given (learn mode), each run stops when the confidence interval of its average profit (batch means) is that narrow.
+    With an EvaluationCache, the runs (candidate, seed) already cached, or equivalent to a cached one (same effective parameters),
+    are not simulated again, and the ones equivalent within a batch are simulated once.
+    """
+    def __init__(self, store_setting: dict, producer: dict, flagDepot: bool, policyClass, setup: list = [], seeds: list = [1],
+                 timeHorizon: int = 7*10000, cor: float = -0.5, transientDays: int = None, learn: bool = True, nWorkers: int = 1, relWidth: float = None,
+                 cache = None):
+        self.settings = (store_setting, producer, flagDepot, policyClass, list(setup), list(seeds), timeHorizon, cor, transientDays, learn, relWidth)
+        self.seeds = list(seeds)
+        self.timeHorizon = timeHorizon
+        self.nWorkers = nWorkers
+        #bounds of the parameters
+        policy = buildPolicy(policyClass, setup, store_setting, producer)
+        self.policy = policy
+        self.lb = np.array(policy.lb, dtype = float)
+        self.ub = np.array(policy.ub, dtype = float)
+        self.dim = len(self.lb)
+        self.retailers = list(store_setting.keys()) #stock-out probabilities are reported per retailer
+        self.pool = None
+        #memoization of the runs
+        self.cache = cache
+        self.configuration = EvaluationCache.configurationKey(store_setting, producer, flagDepot, cor, transientDays, learn, relWidth)
+
+    def evaluate(self, X, clip: bool = False):
+        """
+        X: (n, dim) candidates. If clip, they are projected on [lb,ub], otherwise out of bounds candidates raise a ValueError.
+        It returns a dict of (n,) arrays averaged over the seeds: 'profit' (average daily profit), 'scrapped' (average daily waste),
+        'unmet' (average daily unmet clients), 'steps' (simulated days accounted), 'stdError' (standard error of the profit, batch means)
+        and 'stockout' (dict retailer -> (n,) probabilities).
+        """
+        X = np.atleast_2d(np.asarray(X, dtype = float))
+        if X.shape[1] != self.dim:
+            raise ValueError('Candidates must have ' + str(self.dim) + ' parameters.')
+        if clip:
+            X = np.clip(X, self.lb, self.ub)
+        elif np.any(X < self.lb) or np.any(X > self.ub):
+            raise ValueError('Candidates out of bounds.')
+        #one run per candidate and seed
+        runs = [(x, seed) for x in X for seed in self.seeds]
+        if self.cache is None:
+            results = self._simulate(runs)
+        else:
+            keys = [self.cache.getKey(self.configuration, self.policy, x, seed, self.timeHorizon) for x,seed in runs]
+            found = {}
+            missing = {}
+            for key,run in zip(keys, runs):
+                if key not in found and key not in missing:
+                    metrics = self.cache.get(key)
+                    if metrics is None:
+                        missing[key] = run
+                    else:
+                        found[key] = metrics
+            for key,metrics in zip(missing.keys(), self._simulate(list(missing.values()))):
+                self.cache.put(key, metrics)
+                found[key] = metrics
+            results = [found[key] for key in keys]
+        #average over the seeds
+        nSeeds = len(self.seeds)
+        out = {metric: np.zeros(len(X)) for metric in ['profit','scrapped','unmet','steps','stdError']}
+        out['stockout'] = {k: np.zeros(len(X)) for k in self.retailers}
+        for i in range(len(X)):
+            metrics = {'profit': 0, 'scrapped': 0, 'unmet': 0, 'steps': 0, 'stdError': 0, 'stockout': {k: 0 for k in self.retailers}}
+            for r in results[i*nSeeds:(i + 1)*nSeeds]:
+                for k in ['profit','scrapped','unmet','steps']:
+                    metrics[k] += r[k]
+                metrics['stdError'] += r['stdError']**2
+                for k in self.retailers:
+                    metrics['stockout'][k] += r['stockout'][k]
+            for k in ['profit','scrapped','unmet','steps']:
+                out[k][i] = metrics[k] / nSeeds
+            #standard error of the average over the seeds (independent runs)
+            out['stdError'][i] = np.sqrt(metrics['stdError']) / nSeeds
+            for k in self.retailers:
+                out['stockout'][k][i] = metrics['stockout'][k] / nSeeds
+        return out
+
+    def _simulate(self, runs: list):
+        #metrics of the (x, seed) runs
+        if self.nWorkers == 1:
+            if _worker is None or _worker['settings'] is not self.settings:
+                _initWorker(self.settings)
+            return [_evaluateRun(run) for run in runs]
+        if self.pool is None:
+            self.pool = ProcessPoolExecutor(max_workers = self.nWorkers, initializer = _initWorker, initargs = (self.settings,))
+        return list(self.pool.map(_evaluateRun, runs, chunksize = max(1, len(runs)//(4*self.nWorkers))))
+
+    def close(self):
+        #it shuts the workers down
+        if self.pool is not None:
+            self.pool.shutdown()
+            self.pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def _initWorker(settings):
+    global _worker
+    store_setting, producer, flagDepot, policyClass, setup, seeds, timeHorizon, cor, transientDays, learn, relWidth = settings
+    env = buildSimulation(store_setting, producer, flagDepot, timeHorizon, cor, transientDays = transientDays)
+    if learn:
+        env.setLearn()
+        if relWidth is not None:
+            env.statMgr.setStoppingRule('batchMeans',relWidth)
+    else:
+        env.setTest()
+    #only the metrics are needed
+    env.setRecordHistory(False)
+    env.statMgr.setHistory('summary')
+    #the scenarios of each seed are generated once per worker
+    env.setScenarioStore(ScenarioStore())
+    policy = buildPolicy(policyClass, setup, store_setting, producer)
+    _worker = {'settings': settings, 'env': env, 'policy': policy, 'seeds': seeds}
+
+def _evaluateRun(run):
+    #metrics of the parameters x on a seed (JSON-serializable)
+    x, seed = run
+    env = _worker['env']
+    policy = _worker['policy']
+    policy.setParameters(*policy.xToParams(x))
+    env.setSeed('All', seed)
+    obs = env.reset()
+    done = False
+    while not done:
+        obs, reward, done, _ = env.step(*policy.decide(obs))
+    return {'profit': float(env.getAverageProfit()), 'scrapped': float(env.getAverageScrapped()), 'unmet': float(env.getAverageUnmetClients()),
+            'steps': float(env.statMgr.getNumberSteps()), 'stdError': float(env.getStandardError()),
+            'stockout': {k: float(env.statMgr.getStockOutProb(k)) for k in env.statMgr.ret_list}}
@@ -0,0 +1,143 @@
+"""
+Racing of candidate policies: all the candidates are simulated together and the dominated ones are dropped early
+"""
+import numpy as np
+from scipy.stats import t as student
+from envs import buildSimulation, BatchDailySimulation
+from policies.policyFactory import buildPolicy
+
+class RacingEvaluator:
+    """
+    It compares many candidates (policy class, setup, parameters x) on a configuration, e.g., several x of a policy or
+    several policies (FPL, FPC, SP, SC, 2K variants). The candidates step day by day in one BatchDailySimulation on the same
+    scenarios (common random numbers, one replication per candidate and seed) and their decisions are taken by decideBatch.
+    Every checkEvery days (after minDays accounted days) the running average profit of each candidate is compared with the
+    one of the current best: a candidate is dropped if the best is better with the given confidence (one-sided paired test on
+    the batch means of the daily profit differences, Bonferroni correction over the candidates racing).
+    The replications of the dropped candidates are removed (selectReplications), thus the simulation effort goes to the contenders.
+    The race ends when keep candidates are left or at the end of the horizon.
+    """
+    def __init__(self, store_setting: dict, producer: dict, flagDepot: bool, seeds: list = [1], timeHorizon: int = 7*10000,
+                 cor: float = -0.5, transientDays: int = None, confidence: float = 0.95, minDays: int = 7*26, checkEvery: int = 7*4,
+                 nBatches: int = 32, batchSize: int = 7, keep: int = 1):
+        self.store_setting = store_setting
+        self.producer = producer
+        self.flagDepot = flagDepot
+        self.seeds = list(seeds)
+        self.timeHorizon = timeHorizon
+        self.cor = cor
+        self.transientDays = transientDays
+        self.confidence = confidence
+        self.minDays = minDays
+        self.checkEvery = checkEvery
+        self.nBatches = nBatches
+        self.batchSize = batchSize
+        self.keep = keep
+        #policies built once per (class, setup)
+        self.policies = {}
+
+    def getPolicy(self, policyClass, setup: list):
+        key = (policyClass, tuple((method, tuple(args)) for method,args in setup))
+        if key not in self.policies:
+            policy = buildPolicy(policyClass, list(setup), self.store_setting, self.producer)
+            if not hasattr(policy, 'decideBatch'):
+                raise ValueError('Racing requires policies with decideBatch.')
+            self.policies[key] = policy
+        return self.policies[key]
+
+    def race(self, candidates: list):
+        """
+        candidates: list of (policyClass, setup, x), e.g., [(policyClass, setup, x) for x in X] (see policies.policyFactory.policySpec).
+        It returns a report dict with, per candidate, the average daily 'profit' (at the end of its race) and the accounted 'days',
+        the indices of the 'survivors' (the best first), the 'best' candidate, the replication-days simulated ('simulatedDays')
+        and the ones of the full-length simulations of all the candidates ('fullDays').
+        """
+        nCand = len(candidates)
+        nSeeds = len(self.seeds)
+        policies = [self.getPolicy(policyClass, setup) for policyClass,setup,_ in candidates]
+        X = [np.asarray(x, dtype = float) for _,_,x in candidates]
+        env = buildSimulation(self.store_setting, self.producer, self.flagDepot, self.timeHorizon, self.cor, transientDays = self.transientDays)
+        batchEnv = BatchDailySimulation(env.retailers, env.depot, env.statMgr, self.timeHorizon, nCand*nSeeds)
+        #replication i*nSeeds + j is candidate i on seed j
+        obs = batchEnv.reset(self.seeds*nCand)
+        alive = np.arange(nCand)
+        profit = np.zeros(nCand)
+        days = np.zeros(nCand, dtype = int)
+        #batch means of the daily profit of each candidate (averaged over the seeds)
+        batches = np.zeros((nCand, 2*self.nBatches))
+        total = np.zeros(nCand)
+        nFull = 0
+        count = 0
+        batchSize = self.batchSize
+        groups = self._groups(policies, X, alive, nSeeds)
+        simulatedDays = 0
+        done = False
+        while not done:
+            obs, reward, done, _ = batchEnv.step(*self._decide(groups, obs, batchEnv.nBatch))
+            simulatedDays += batchEnv.nBatch
+            if batchEnv.n == 0:
+                #transient days
+                continue
+            total[alive] += reward.reshape(len(alive), nSeeds).mean(axis = 1)
+            count += 1
+            if count == batchSize:
+                batches[alive, nFull] = total[alive] / batchSize
+                total[:] = 0
+                count = 0
+                nFull += 1
+                if nFull == 2*self.nBatches:
+                    batches[:, :self.nBatches] = (batches[:, 0::2] + batches[:, 1::2])/2
+                    nFull = self.nBatches
+                    batchSize *= 2
+            if batchEnv.n >= self.minDays and batchEnv.current_step % self.checkEvery == 0 and nFull > 1:
+                estimates = batchEnv.getAverageProfit().reshape(len(alive), nSeeds).mean(axis = 1)
+                best = np.argmax(estimates)
+                diff = batches[alive[best], :nFull] - batches[alive, :nFull]
+                stdError = np.std(diff, axis = 1, ddof = 1)/np.sqrt(nFull)
+                alpha = (1 - self.confidence)/max(len(alive) - 1, 1)
+                dropped = estimates[best] - estimates > student.ppf(1 - alpha, nFull - 1)*stdError
+                dropped[best] = False
+                if np.any(dropped):
+                    profit[alive[dropped]] = estimates[dropped]
+                    days[alive[dropped]] = batchEnv.n
+                    kept = np.flatnonzero(~dropped)
+                    rows = (kept[:, None]*nSeeds + np.arange(nSeeds)).reshape(-1)
+                    batchEnv.selectReplications(rows)
+                    obs = {k: {key: value[rows] for key,value in obs[k].items()} for k in obs.keys()}
+                    alive = alive[kept]
+                    groups = self._groups(policies, X, alive, nSeeds)
+                    if len(alive) <= self.keep:
+                        done = True
+        #candidates left
+        profit[alive] = batchEnv.getAverageProfit().reshape(len(alive), nSeeds).mean(axis = 1)
+        days[alive] = batchEnv.n
+        survivors = alive[np.argsort(-profit[alive], kind = 'stable')]
+        return {'profit': profit, 'days': days, 'survivors': survivors, 'best': survivors[0],
+                'simulatedDays': simulatedDays, 'fullDays': nCand*nSeeds*(self.timeHorizon - 1)}
+
+    def _groups(self, policies: list, X: list, alive: np.array, nSeeds: int):
+        #replications (rows) and parameters of the candidates racing, grouped by policy
+        groups = {}
+        for row,i in enumerate(alive):
+            rows,params = groups.setdefault(id(policies[i]), (policies[i], [], []))[1:]
+            rows.extend(range(row*nSeeds, (row + 1)*nSeeds))
+            params.extend([X[i]]*nSeeds)
+        return [(policy, np.array(rows), np.array(params)) for policy,rows,params in groups.values()]
+
+    def _decide(self, groups: list, obs: dict, nBatch: int):
+        if len(groups) == 1:
+            policy,_,params = groups[0]
+            return policy.decideBatch(obs, params)
+        orderSize = {}
+        dispatched = {}
+        for policy,rows,params in groups:
+            o,d = policy.decideBatch({k: {key: value[rows] for key,value in obs[k].items()} for k in obs.keys()}, params)
+            if len(o) > 0:
+                if len(orderSize) == 0:
+                    orderSize = np.zeros((nBatch,) + np.shape(o)[1:])
+                orderSize[rows] = o
+            for k in d.keys():
+                if k not in dispatched:
+                    dispatched[k] = np.zeros((nBatch,) + np.shape(d[k])[1:])
+                dispatched[k][rows] = d[k]
+        return orderSize,dispatched
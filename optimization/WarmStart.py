@@ -0,0 +1,138 @@
+"""
+Warm start of the policy parameters: analytic newsvendor/base-stock starting points and short screening simulations
+"""
+import numpy as np
+from scipy.stats import norm
+from envs import buildSimulation, BatchDailySimulation
+from policies import SingleEchCOP_BSP, SingleRetailerDepotPolicy
+from policies.policyFactory import buildPolicy
+
+class WarmStart:
+    """
+    Starting point and tighter bounds of the parameters of a policy (SingleRetailerDepotPolicy or SingleEchCOP_BSP),
+    computed from ev_Daily, std_Daily, P, MD of the channels and C, SL, LT (and RLT) of the producer.
+    Demand is approximated as normal and each channel targets the newsvendor critical ratio (P - C)/(P - MD):
+        COP: the daily mean plus a safety stock pooled over the shelf life, mu + z*sigma/sqrt(SL - LT)
+        BSP: the demand over the protection interval L (lead time + review), L*mu + z*sigma*sqrt(L),
+             the depot order-up-to level covers the echelon (LT + RLT_k + 1 days for each channel k)
+    screen then refines the start with short batched simulations of many candidates on common random numbers
+    (BatchDailySimulation and decideBatch), so that only the best ones need full-length evaluations.
+    """
+    def __init__(self, store_setting: dict, producer: dict, flagDepot: bool, policyClass, setup: list = [], cor: float = -0.5):
+        self.store_setting = store_setting
+        self.producer = producer
+        self.flagDepot = flagDepot
+        self.policyClass = policyClass
+        self.setup = list(setup)
+        self.cor = cor
+        self.policy = buildPolicy(policyClass, setup, store_setting, producer)
+        if not isinstance(self.policy, (SingleRetailerDepotPolicy, SingleEchCOP_BSP)):
+            raise ValueError('Warm start not available for this policy.')
+
+    def criticalRatio(self, k: str):
+        #newsvendor critical ratio of channel k, kept away from 0 and 1
+        P = self.store_setting[k]['P']
+        q = (P - self.producer['C']) / (P - self.store_setting[k]['MD'])
+        return np.clip(q,0.01,0.99)
+
+    def demandMoments(self, channels: dict):
+        #mean, standard deviation and critical ratio of the demand of the channels over channels[k] days, with correlation cor
+        mean = 0
+        var = 0
+        keys = list(channels.keys())
+        for i,k in enumerate(keys):
+            mean += channels[k]*self.store_setting[k]['ev_Daily']
+            var += channels[k]*self.store_setting[k]['std_Daily']**2
+            for l in keys[i+1:]:
+                var += 2*self.cor*min(channels[k],channels[l])*self.store_setting[k]['std_Daily']*self.store_setting[l]['std_Daily']
+        q = np.average([self.criticalRatio(k) for k in keys],weights = [self.store_setting[k]['ev_Daily'] for k in keys])
+        return mean, np.sqrt(max(var,0)), q
+
+    def baseStock(self, channels: dict):
+        #order-up-to level covering the protection interval channels[k] (days) of each channel k
+        mean,sd,q = self.demandMoments(channels)
+        return mean + norm.ppf(q)*sd, sd
+
+    def constantOrder(self, channels: list):
+        #constant daily order of the channels, safety stock pooled over the shelf life
+        mean,sd,q = self.demandMoments({k: 1 for k in channels})
+        return mean + norm.ppf(q)*sd/np.sqrt(self.producer['SL'] - self.producer['LT']), sd
+
+    def analytic(self):
+        """
+        It returns the starting point x0 and the tighter bounds lb, ub (within the bounds of the policy)
+        """
+        policy = self.policy
+        x0 = np.zeros(policy.dim)
+        lb = np.array(policy.lb,dtype = float)
+        ub = np.array(policy.ub,dtype = float)
+        width = np.full(policy.dim,np.inf) #half-width of the tighter bounds
+        LT = self.producer['LT']
+        if isinstance(policy, SingleEchCOP_BSP):
+            for i,k in enumerate(policy.retailers):
+                if k in policy.bsp_ret:
+                    x0[i],sd = self.baseStock({k: LT + 1})
+                    width[i] = 3*sd
+                else:
+                    x0[i],sd = self.constantOrder([k])
+                    width[i] = 2*sd
+        else:
+            offLine = list(policy.offLine_setting.keys())
+            #depot order
+            if policy.orderPolicy == 'BSP':
+                x0[0],sd = self.baseStock({k: LT + 1 + self.store_setting[k].get('RLT',0) for k in self.store_setting.keys()})
+                width[0] = 3*sd
+            else:
+                x0[0],sd = self.constantOrder(list(self.store_setting.keys()))
+                width[0] = 2*sd
+            #dispatch requests
+            for i,k in enumerate(offLine):
+                if policy.dispatchPolicy == 'BSP':
+                    x0[1+i],sd = self.baseStock({k: self.store_setting[k]['RLT'] + 1})
+                    width[1+i] = 3*sd
+                else:
+                    x0[1+i],sd = self.constantOrder([k])
+                    width[1+i] = 2*sd
+            #other parameters
+            other = 1 + len(offLine)
+            if policy.twoKdispatch:
+                for i,k in enumerate(offLine):
+                    #half of the ages as old, equal weights (the plain BSP)
+                    x0[other + 3*i:other + 3*i + 3] = [np.floor(ub[other + 3*i]/2),1,1]
+            if policy.criticalToServe:
+                #the online demand of the day at its critical ratio
+                x0[-1],_ = self.baseStock({'OnLine': 1})
+        lb = np.maximum(lb,x0 - width)
+        ub = np.minimum(ub,x0 + width)
+        x0 = np.clip(x0,lb,ub)
+        return x0,lb,ub
+
+    def screen(self, nCandidates: int = 64, keep: int = 8, weeks: int = 52, seeds: list = [1], fullHorizon: int = 7*10000, randomSeed: int = 0):
+        """
+        It simulates the analytic start and nCandidates - 1 random candidates within the tighter bounds for weeks weeks on the seeds
+        (one BatchDailySimulation of nCandidates*len(seeds) replications on common random numbers).
+        It returns a report dict with the best candidate 'x0', the bounds 'lb', 'ub' spanned by the keep best candidates,
+        their parameters and profits ('kept', 'keptProfit'), the simulated 'screeningDays' and 'estimatedSavedFullSims'. The latter is only
+        an estimate: the full-length simulations (of fullHorizon days) the screened-out candidates would have needed minus the screening
+        days in full-length simulations, negative when the screening simulated more days than it spared.
+        """
+        x0,lb,ub = self.analytic()
+        rng = np.random.default_rng(randomSeed)
+        X = np.vstack([x0,lb + rng.random((nCandidates - 1,len(x0)))*(ub - lb)])
+        #short simulation of all the candidates, each one on all the seeds
+        timeHorizon = 7*weeks
+        env = buildSimulation(self.store_setting, self.producer, self.flagDepot, timeHorizon, self.cor)
+        batchEnv = BatchDailySimulation(env.retailers,env.depot,env.statMgr,timeHorizon,nCandidates*len(seeds))
+        XBatch = np.repeat(X,len(seeds),axis = 0)
+        obs = batchEnv.reset(list(seeds)*nCandidates)
+        done = False
+        while not done:
+            obs,_,done,_ = batchEnv.step(*self.policy.decideBatch(obs,XBatch))
+        profit = batchEnv.getAverageProfit().reshape(nCandidates,len(seeds)).mean(axis = 1)
+        best = np.argsort(-profit,kind = 'stable')[:keep]
+        #bounds spanned by the best candidates, with a margin of 10% of the screened box
+        margin = 0.1*(ub - lb)
+        screeningDays = batchEnv.nBatch*timeHorizon
+        return {'x0': X[best[0]], 'lb': np.maximum(lb,X[best].min(axis = 0) - margin), 'ub': np.minimum(ub,X[best].max(axis = 0) + margin),
+                'kept': X[best], 'keptProfit': profit[best], 'screened': nCandidates, 'screeningDays': screeningDays,
+                'estimatedSavedFullSims': (nCandidates - len(best))*len(seeds) - screeningDays/fullHorizon}
@@ -0,0 +1,11 @@
+from .PolicyEvaluator import PolicyEvaluator
+from .WarmStart import WarmStart
+from .RacingEvaluator import RacingEvaluator
+from .EvaluationCache import EvaluationCache
+
+__all__ = [
+    "PolicyEvaluator",
+    "WarmStart",
+    "RacingEvaluator",
+    "EvaluationCache"
+]
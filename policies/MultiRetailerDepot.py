@@ -0,0 +1,139 @@
+from policies.SingleRetailerDepot import SingleRetailerDepotPolicy
+import numpy as np
+
+class MultiRetailerDepotPolicy(SingleRetailerDepotPolicy):
+    def __init__(self, store_setting:dict, prod_setting: dict, paramsOrder: float, paramsDispatch:dict, paramsOther: dict = {}):
+        """
+        Order and dispatch policies of SingleRetailerDepotPolicy (COP/BSP, 2k, critical online, LIFO/FIFO internal issuing)
+        for MANY offline retailers under one depot, e.g., the stores of multiStoreSetting.
+
+        When the depot cannot fulfil all the dispatch requests, the inventory is rationed among the retailers
+        age by age, in the internal issuing order, according to the rule of setRationing:
+            priority: the retailers are served one after the other (by default in the order of the setting, as SingleRetailerDepotPolicy)
+            proportional: each retailer gets a share proportional to its residual request (largest remainders to round)
+            fairShare: max-min fair share (water-filling) of the residual requests
+        Each retailer only receives the ages that do not expire before it receives them (residual shelf life > RLT).
+        Requests, rationing and decisions are array operations over the retailers and the ages: the decisions are the rows
+        of a (retailers,SL) matrix indexed by the residual shelf life at the depot, dispatched[k] is a view of the row of k.
+        """
+        super().__init__(store_setting, prod_setting, paramsOrder, paramsDispatch, paramsOther)
+        self.name = "Multi Retailer Depot Policy"
+        self.retailers = list(self.offLine_setting.keys())
+        self.RLT = np.array([self.store_setting[k]['RLT'] for k in self.retailers],dtype = int)
+        #eligible[i,j]: the items with residual shelf life j+1 at the depot can be dispatched to retailer i
+        self.eligible = np.arange(self.SL)[None,:] >= self.RLT[:,None]
+        self.setRationing('priority')
+
+    #allows for selecting the rationing rule
+    def setRationing(self, rationing: str = 'priority', priorities: list = None):
+        """
+        rationing: 'priority', 'proportional' or 'fairShare'.
+        priorities: the offline retailers from the first served to the last one (default order of the setting).
+        It sets the order of the priority rule and breaks the ties of the rounding of the other rules.
+        """
+        if rationing not in ['priority','proportional','fairShare']:
+            raise ValueError('Rationing rule not available')
+        if priorities is None:
+            priorities = self.retailers
+        if sorted(priorities) != sorted(self.retailers):
+            raise ValueError('Priorities must rank all the offline retailers.')
+        self.rationing = rationing
+        self.priorities = np.array([self.retailers.index(k) for k in priorities],dtype = int)
+
+    def initDecision(self):
+        #decision matrix and its views per retailer
+        self.decision = np.zeros((len(self.retailers),self.SL))
+        self.dispatched = {k: self.decision[i,self.RLT[i]:] for i,k in enumerate(self.retailers)}
+        self.orderSize = np.zeros(self.SL)
+
+    ############
+    def decide(self, obs):
+        self.initDecision()
+        #a batch of one state
+        obsBatch = {k: {key: np.asarray(value)[None] for key,value in obs[k].items()} for k in obs.keys()}
+        X = self._paramsBatch(obsBatch)
+        self.orderSize[:] = self._orderBatch(obsBatch,X)[0]
+        self.decision[:] = self._allocate(self._availableBatch(obsBatch,X),self._requestsBatch(obsBatch,X))[0]
+        return self.orderSize,self.dispatched
+
+    def decideBatch(self, obsBatch, X: np.array = None):
+        """
+        Decisions of N states and parameter vectors together (see SingleRetailerDepotPolicy.decideBatch), rationed as in decide.
+        """
+        X = self._paramsBatch(obsBatch,X)
+        orderSize = self._orderBatch(obsBatch,X)
+        decision = self._allocate(self._availableBatch(obsBatch,X),self._requestsBatch(obsBatch,X))
+        return orderSize,{k: decision[:,i,self.RLT[i]:] for i,k in enumerate(self.retailers)}
+
+    def _requestsBatch(self, obsBatch, X: np.array):
+        #(N,retailers) rounded dispatch requests
+        nBatch = X.shape[0]
+        nRet = len(self.retailers)
+        if self.dispatchPolicy != 'BSP':
+            return np.rint(X[:,1:1 + nRet])
+        #inventory positions of the retailers, indexed as the depot inventory (residual shelf life at the depot)
+        inv = np.zeros((nBatch,nRet,self.SL))
+        onOrder = np.zeros((nBatch,nRet))
+        for i,k in enumerate(self.retailers):
+            inv[:,i,self.RLT[i]:] = obsBatch[k]['inventory']
+            onOrder[:,i] = np.sum(np.reshape(obsBatch[k]['dispatched'],(nBatch,-1)),axis = 1)
+        if self.twoKdispatch:
+            other = X[:,1 + nRet:1 + 4*nRet].reshape(nBatch,nRet,3)
+            #ages weighted as old
+            old = np.arange(self.SL)[None,None,:] < (self.RLT[None,:] + other[:,:,0].astype(int))[:,:,None]
+            return np.rint(np.maximum(X[:,1:1 + nRet] - onOrder - other[:,:,1]*np.sum(inv*old,axis = 2) - other[:,:,2]*np.sum(inv*~old,axis = 2),0)) #BSP2k
+        return np.rint(np.maximum(X[:,1:1 + nRet] - np.sum(inv,axis = 2) - onOrder,0)) #BSP
+
+    def _allocate(self, availableInv: np.array, requests: np.array):
+        """
+        (N,retailers,SL) dispatch decisions of the available inventory (N,SL) given the requests (N,retailers).
+        The ages are visited in the internal issuing order, the rationing rule splits each age among the residual requests
+        of the retailers that can receive it.
+        """
+        nBatch = availableInv.shape[0]
+        available = np.rint(availableInv).astype(np.int64)
+        #retailers in priority order
+        queue = requests[:,self.priorities].astype(np.int64)
+        eligible = self.eligible[self.priorities]
+        decision = np.zeros((nBatch,len(self.retailers),self.SL))
+        list_ages = range(self.SL) if self.issuingPolicy == 'FIFO' else reversed(range(self.SL))
+        for d in list_ages:
+            if not np.any(eligible[:,d]):
+                continue
+            req = np.where(eligible[:,d],queue,0)
+            disp = self._ration(available[:,d],req)
+            decision[:,self.priorities,d] = disp
+            queue -= disp
+            available[:,d] -= disp.sum(axis = 1)
+        return decision
+
+    def _ration(self, available: np.array, req: np.array):
+        #(N,retailers) integer split of the available items (N,) among the requests (N,retailers) in priority order
+        total = req.sum(axis = 1)
+        short = total > available
+        if not np.any(short):
+            return req
+        if self.rationing == 'priority':
+            disp = np.clip(available[:,None] - (np.cumsum(req,axis = 1) - req),0,req)
+        elif self.rationing == 'proportional':
+            share = req*available[:,None]
+            total = np.maximum(total,1)[:,None]
+            disp = share//total
+            #largest remainders (ties to the first in priority) get the items left
+            left = available - disp.sum(axis = 1)
+            rank = np.argsort(np.argsort(-(share%total),axis = 1,kind = 'stable'),axis = 1)
+            disp += rank < left[:,None]
+        else: #fairShare
+            nRet = req.shape[1]
+            sortedReq = np.sort(req,axis = 1)
+            below = np.cumsum(sortedReq,axis = 1) - sortedReq
+            above = nRet - np.arange(nRet) #retailers requesting at least sortedReq[:,i]
+            #first level that cannot be served to all
+            i = np.argmax(below + sortedReq*above > available[:,None],axis = 1)
+            level = (available - below[np.arange(len(i)),i])//above[i]
+            disp = np.minimum(req,level[:,None])
+            #items left, one each to the first in priority still unserved
+            left = available - disp.sum(axis = 1)
+            unserved = req > disp
+            disp += unserved & (np.cumsum(unserved,axis = 1) <= left[:,None])
+        return np.where(short[:,None],disp,req)
@@ -0,0 +1,183 @@
+"""
+Rollout lookahead on top of a parametric policy
+"""
+import copy
+import itertools
+import numpy as np
+from policies.PolicyMultiEchelon import PolicyMultiEchelon
+
+class RolloutPolicy:
+    def __init__(self, basePolicy, env, horizon: int = 7, nSamples: int = 32, steps: list = [-1,-0.5,0,0.5,1], salvage: float = None,
+                 maxCandidates: int = 32, poolWeeks: int = 500, seed: int = 0):
+        """
+        One-step lookahead of a base policy with decideBatch (SingleRetailerDepotPolicy, MultiRetailerDepotPolicy, SingleEchCOP_BSP),
+        e.g., the BSP/SC rules of policySpec, controlling the DailySimulation env. At each decision the current state is forked
+        (BatchDailySimulation.setState) into nCandidates x nSamples replications: each candidate is a perturbation of the base
+        parameters that sets the action of the day, then the base policy with its own parameters decides the following horizon - 1 days.
+        All the candidates are simulated on the same nSamples demand futures (common random numbers) and the action of the candidate
+        with the best average profit over the horizon, plus salvage per unit left in stock and in the pipelines, is taken. By default
+        salvage is 80% of the purchase cost C: part of the stock left expires, and valuing it at C makes the lookahead order too much.
+
+        Candidates (see gridCandidates and setCandidates): steps (in daily standard deviations of the demand) on the order and on the
+        dispatch requests with depot, on the order of each retailer without it. The base parameters are the first candidate, thus
+        they win the ties.
+
+        Futures are windows of a pool of poolWeeks weeks of scenarios (demand and LIFO clients) drawn once with seed from copies of the
+        managers of env, i.e., with its distributions, correlation and LIFO settings: decisions neither consume the random numbers
+        of env nor touch its generators. setFutures replaces the pool (e.g., with the futures of another generator).
+
+        The parameters (setParameters, xToParams, dim, lb, ub) are the ones of the base policy.
+        """
+        #the batch engine and the scenario replay are imported here, the policies do not depend on the simulation packages
+        from managers.ScenarioStore import replayScenario
+        self.basePolicy = basePolicy
+        self.name = 'Rollout ' + str(basePolicy.name)
+        self.horizon = horizon
+        self.nSamples = nSamples
+        self.flagDepot = isinstance(basePolicy, PolicyMultiEchelon)
+        self.store_setting = basePolicy.store_setting
+        self.prod_setting = basePolicy.prod_setting
+        self.salvage = 0.8*self.prod_setting['C'] if salvage is None else salvage
+        self.rng = np.random.default_rng(seed)
+        #copies of the managers of env (configuration of the lookahead), the futures and the LIFO clients draw from (and then restore)
+        #the global generator
+        generators = {}
+        self.retailers = {k: _privateManager(env.retailers[k], generators) for k in env.retailers.keys()}
+        self.depot = _privateManager(env.depot, generators) if env.depot != None else None
+        self.statMgr = copy.deepcopy(env.statMgr)
+        state = np.random.get_state()
+        self.setFutures(*replayScenario(self.retailers, self.depot, 7*poolWeeks, seed))
+        np.random.set_state(state)
+        #the lookahead accounts the rewards of all its days, not a meaningful horizon for statistics
+        self.statMgr.setHead(0)
+        self.statMgr.minN = 0
+        self.batchEnv = None
+        self.setCandidates(self.gridCandidates(steps, maxCandidates))
+
+    def setFutures(self, demand: dict, lifo: dict):
+        """
+        Pool of futures: demand and LIFO clients of each node ('Depot' and the retailers) as (poolDays,) arrays, e.g., of replayScenario.
+        Day 0 is never drawn, as in the simulation.
+        """
+        self.poolDemand = {k: np.asarray(demand[k], dtype = float) for k in demand.keys()}
+        self.poolLifo = {k: np.asarray(lifo[k], dtype = float) for k in lifo.keys()}
+        if len(self.poolDemand[next(iter(self.poolDemand))]) <= self.horizon:
+            raise ValueError('The pool of futures must be longer than the horizon.')
+
+    @property
+    def dim(self):
+        return self.basePolicy.dim
+    @property
+    def lb(self):
+        return self.basePolicy.lb
+    @property
+    def ub(self):
+        return self.basePolicy.ub
+
+    def setParameters(self, *params):
+        self.basePolicy.setParameters(*params)
+
+    def xToParams(self, x: np.array):
+        return self.basePolicy.xToParams(x)
+
+    def gridCandidates(self, steps: list, maxCandidates: int = 32):
+        """
+        (nCandidates,dim) offsets of the default grid, the zero offset first. With depot, all the pairs of steps on the order and on
+        the dispatch requests. Without depot, all the combinations of steps on the orders of the retailers if they are at most
+        maxCandidates, otherwise the steps on one retailer at a time (linear in the number of retailers).
+        """
+        steps = np.asarray(steps,dtype = float)
+        offsets = []
+        if self.flagDepot:
+            offLine = list(self.basePolicy.offLine_setting.keys())
+            sdOrder = np.sqrt(sum(self.store_setting[k]['std_Daily']**2 for k in self.store_setting.keys()))
+            sdDispatch = np.array([self.store_setting[k]['std_Daily'] for k in offLine])
+            for a,b in itertools.product(steps,steps):
+                delta = np.zeros(self.dim)
+                delta[0] = a*sdOrder
+                delta[1:1 + len(offLine)] = b*sdDispatch
+                offsets.append(delta)
+        else:
+            sd = np.array([self.store_setting[k]['std_Daily'] for k in self.basePolicy.retailers])
+            if len(steps)**len(sd) <= maxCandidates:
+                for combination in itertools.product(steps,repeat = len(sd)):
+                    offsets.append(np.array(combination)*sd)
+            else:
+                offsets.append(np.zeros(len(sd)))
+                for i in range(len(sd)):
+                    for a in steps[steps != 0]:
+                        delta = np.zeros(len(sd))
+                        delta[i] = a*sd[i]
+                        offsets.append(delta)
+        offsets = np.array(offsets)
+        #base parameters first
+        return offsets[np.argsort(np.any(offsets != 0,axis = 1),kind = 'stable')]
+
+    def setCandidates(self, offsets: np.array):
+        """
+        offsets: (nCandidates,dim) perturbations of the base parameters evaluated at each decision (clipped to lb, ub)
+        """
+        self.offsets = np.atleast_2d(np.asarray(offsets,dtype = float))
+        if self.offsets.shape[1] != self.dim:
+            raise ValueError('An offset per parameter is required.')
+        self.nCandidates = self.offsets.shape[0]
+        #replications of the lookahead: candidate-major, the samples of a candidate are contiguous
+        nBatch = self.nCandidates*self.nSamples
+        if self.batchEnv is None or self.batchEnv.nBatch != nBatch:
+            from envs import BatchDailySimulation
+            self.batchEnv = BatchDailySimulation(self.retailers, self.depot, self.statMgr, self.horizon + 1, nBatch)
+
+    def _baseParams(self):
+        #parameter vector of the base policy
+        policy = self.basePolicy
+        if self.flagDepot:
+            return np.concatenate([[policy.paramsOrder],[policy.paramsDispatch[k] for k in policy.offLine_setting.keys()],
+                                   np.asarray(policy.paramsOther if len(policy.paramsOther) > 0 else [],dtype = float)])
+        return np.array([policy.paramsDispatch[k] for k in policy.retailers],dtype = float)
+
+    ############
+    def decide(self, obs):
+        """
+        The observation and the decisions have the format of the base policy.
+        The estimated profit of each candidate is left in self.values and the chosen one in self.best.
+        """
+        x = self._baseParams()
+        X = np.repeat(np.clip(x + self.offsets,self.basePolicy.lb,self.basePolicy.ub),self.nSamples,axis = 0)
+        #demand futures, the same for all the candidates
+        start = self.rng.integers(1,len(self.poolDemand[next(iter(self.poolDemand))]) - self.horizon + 1,self.nSamples)
+        days = start[:,None] + np.arange(self.horizon)
+        demand = {}
+        lifo = {}
+        for k in self.batchEnv.nodes.keys():
+            demand[k] = np.zeros((self.nSamples,self.horizon + 1))
+            lifo[k] = np.zeros((self.nSamples,self.horizon + 1))
+            demand[k][:,1:] = self.poolDemand[k][days]
+            lifo[k][:,1:] = self.poolLifo[k][days]
+        self.batchEnv.setScenarios({k: np.tile(demand[k],(self.nCandidates,1)) for k in demand.keys()},
+                                   {k: np.tile(lifo[k],(self.nCandidates,1)) for k in lifo.keys()})
+        batchObs = self.batchEnv.setState(obs)
+        #the action of the day of each candidate, then the base policy
+        orderSize,dispatched = self.basePolicy.decideBatch(batchObs,X)
+        total = np.zeros(self.batchEnv.nBatch)
+        for day in range(self.horizon):
+            action = (orderSize,dispatched) if day == 0 else self.basePolicy.decideBatch(batchObs,x)
+            batchObs,reward,_,_ = self.batchEnv.step(*action)
+            total += reward
+        #stock left in the nodes and in their pipelines
+        for k in batchObs.keys():
+            for value in batchObs[k].values():
+                total += self.salvage*np.sum(np.reshape(value,(self.batchEnv.nBatch,-1)),axis = 1)
+        self.values = total.reshape(self.nCandidates,self.nSamples).mean(axis = 1)
+        self.best = int(np.argmax(self.values))
+        row = self.best*self.nSamples
+        return (orderSize[row].copy() if self.flagDepot else {}),{k: dispatched[k][row].copy() for k in dispatched.keys()}
+
+
+def _privateManager(manager, generators: dict):
+    #shallow copy of a manager with its own copy of the scenario generator (one per generator shared by the managers of env):
+    #the generators draw new arrays at each reset, thus the futures do not touch the scenarios and the seed of env
+    manager = copy.copy(manager)
+    if id(manager.scenarioMgr) not in generators:
+        generators[id(manager.scenarioMgr)] = copy.copy(manager.scenarioMgr)
+    manager.scenarioMgr = generators[id(manager.scenarioMgr)]
+    return manager
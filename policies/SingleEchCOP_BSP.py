@@ -35,6 +35,12 @@ class SingleEchCOP_BSP(PolicySingleEchelon):
         for i,k in enumerate(store_setting.keys()):
             self.ub[i] =  (self.store_setting[k]['ev_Daily'] + 3 * self.store_setting[k]["std_Daily"])
             self.lb[i] += 0*self.store_setting[k]['ev_Daily'] #Lower bound can be increased (within reasonable bounds)
+        #decision matrix retailer x shelf life: only the freshest items (last column) are ordered
+        #the dispatched dict holds views of its rows, rewritten at each decision
+        self.retailers = list(store_setting.keys())
+        self.decisionMatrix = np.zeros((self.dim,self.prod_setting['SL'] - self.prod_setting['LT']))
+        self.dispatched = {k: self.decisionMatrix[i] for i,k in enumerate(self.retailers)}
+        self.bspMask = np.zeros(self.dim,dtype = bool) #BSP retailers
 
         ############
     def decide(self, obs):
@@ -48,23 +54,40 @@ class SingleEchCOP_BSP(PolicySingleEchelon):
         The decision must be made of one dict:
          -containing the dispatched with keys the retailer names
         """
-        self.initDecision()
- 
+        #COP and BSP order-up-to decisions of all the retailers at once
+        x = np.array([self.paramsDispatch[k] for k in self.retailers],dtype = float)
+        invSum = np.array([np.sum(obs[k]['inventory']) for k in self.retailers])
+        dispSum = np.array([np.sum(obs[k]['dispatched']) for k in self.retailers])
         #The items are considered as new as the producer can provide them
-        #COP
-        for k in self.cop_ret:
-            for d in range(self.prod_setting['SL'] - self.prod_setting['LT'] - 1):
-                self.dispatched.get(k)[d] = 0
-            self.dispatched.get(k)[self.prod_setting['SL'] - self.prod_setting['LT']-1] = np.rint(self.paramsDispatch[k])
-        #BSP
-        for k in self.bsp_ret:
-            for d in range(self.prod_setting['SL'] - self.prod_setting['LT'] - 1):
-                self.dispatched.get(k)[d] = 0
-            orderSize = np.max([self.paramsDispatch[k] - sum(obs[k]['inventory']) - np.sum(sum(obs[k]['dispatched'])),0]) #BSP
-            self.dispatched.get(k)[self.prod_setting['SL'] - self.prod_setting['LT'] - 1] = np.rint(orderSize)
+        self.decisionMatrix[:,-1] = np.rint(np.where(self.bspMask,np.maximum(x - invSum - dispSum,0),x))
         ########
         return {},self.dispatched
 
+    def decideBatch(self, obsBatch, X: np.array = None):
+        """
+        Decisions of N states (e.g., the replications of a BatchDailySimulation, with a leading batch axis) together.
+        X: (N,dim) parameter vectors (one per state), a (dim,) vector shared by all the states or None for the current parameters.
+        It returns {} and a dispatched dict of (N,SL - LT) arrays, views of a (N,retailers,SL - LT) decision tensor.
+        """
+        nBatch = np.shape(obsBatch[self.retailers[0]]['inventory'])[0]
+        if X is None:
+            X = np.array([self.paramsDispatch[k] for k in self.retailers],dtype = float)
+        else:
+            X = np.asarray(X,dtype = float)
+            if np.any(X > self.ub) or np.any(X < self.lb):
+                raise ValueError('parameters out of boundaries')
+        invSum = np.stack([np.sum(obsBatch[k]['inventory'],axis = 1) for k in self.retailers],axis = 1)
+        dispSum = np.stack([np.sum(np.reshape(obsBatch[k]['dispatched'],(nBatch,-1)),axis = 1) for k in self.retailers],axis = 1)
+        decisions = np.zeros((nBatch,) + self.decisionMatrix.shape)
+        decisions[:,:,-1] = np.rint(np.where(self.bspMask,np.maximum(X - invSum - dispSum,0),X))
+        return {},{k: decisions[:,i] for i,k in enumerate(self.retailers)}
+
+    def initDecision(self):
+        """
+        Initialization of the decision matrix (the dispatched arrays are its rows)
+        """
+        self.decisionMatrix[:] = 0
+
     def xToParams(self, x:np.array):
         """
         It transforms an array input into params format
@@ -78,6 +101,14 @@ class SingleEchCOP_BSP(PolicySingleEchelon):
             params_disp[k] = x[i]
         return params_disp,{} #empty for other params, required for uniformity with other policies
 
+    def effectiveParams(self, x:np.array):
+        """
+        It returns the parameters as they act on the decisions (a tuple): the levels are compared with integer inventories and
+        rounded, thus only their rounding matters but for the halves (rounded to even after the comparison)
+        """
+        x = np.asarray(x,dtype = float)
+        return tuple(np.where(x - np.floor(x) == 0.5,x,np.rint(x)).tolist())
+
     ####
     def setBSP(self,reatilerName: str):
         # was it COP?
@@ -87,6 +118,7 @@ class SingleEchCOP_BSP(PolicySingleEchelon):
             #upperbound adjustment
             tmpKeyList = list(self.store_setting)
             indx = tmpKeyList.index(reatilerName) #original order
+            self.bspMask[indx] = True
             self.ub[indx] = (self.prod_setting['SL'])*(self.store_setting[reatilerName]['ev_Daily'] + 3 * self.store_setting[reatilerName]["std_Daily"])
         #was it BSP yet?
         elif reatilerName in self.bsp_ret:
@@ -103,6 +135,7 @@ class SingleEchCOP_BSP(PolicySingleEchelon):
             #upperbound adjustment
             tmpKeyList = list(self.store_setting)
             indx = tmpKeyList.index(reatilerName) #original order
+            self.bspMask[indx] = False
             self.ub[indx] = (self.store_setting[reatilerName]['ev_Daily'] + 3 * self.store_setting[reatilerName]["std_Daily"])
         #was it COP yet?
         elif reatilerName in self.cop_ret:
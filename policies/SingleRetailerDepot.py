@@ -170,6 +170,93 @@ class SingleRetailerDepotPolicy(PolicyMultiEchelon):
         ########
         return self.orderSize,self.dispatched
 
+    def decideBatch(self, obsBatch, X: np.array = None):
+        """
+        Decisions of N states and parameter vectors together, e.g., a generation of candidates on a BatchDailySimulation.
+        obsBatch has the format of BatchDailySimulation (a leading batch axis, obs['Depot']['ordered'] of shape (N,LT,SL)).
+        X: (N,dim) parameter vectors (one per state), a (dim,) vector shared by all the states or None for the current parameters.
+        It returns orderSize (N,SL) and dispatched dict of (N,SL - RLT_k) arrays, the same decisions of decide for each row.
+        """
+        X = self._paramsBatch(obsBatch,X)
+        nBatch = X.shape[0]
+        nRet = len(self.offLine_setting.keys())
+        #Orders
+        orderSize = self._orderBatch(obsBatch,X)
+        #Dispatch requests
+        retailer_req = {}
+        for i,k in enumerate(self.offLine_setting.keys()):
+            inv = np.asarray(obsBatch[k]['inventory'])
+            sumDisp = np.sum(np.reshape(obsBatch[k]['dispatched'],(nBatch,-1)),axis = 1)
+            if self.dispatchPolicy == 'BSP':
+                if self.twoKdispatch:
+                    other = X[:,1 + nRet + 3*i:1 + nRet + 3*i + 3]
+                    old = np.arange(inv.shape[1]) < other[:,[0]].astype(int) #ages weighted as old
+                    retailer_req[k] = np.rint(np.maximum(X[:,1+i] - sumDisp - other[:,1]*np.sum(inv*old,axis = 1) - other[:,2]*np.sum(inv*~old,axis = 1),0)) #BSP2k
+                else:
+                    retailer_req[k] = np.maximum(X[:,1+i] - np.sum(inv,axis = 1) - sumDisp,0) #BSP
+            else:
+                retailer_req[k] = X[:,1+i]
+        #Now the depot decides what can serve
+        availableInv = self._availableBatch(obsBatch,X)
+        #####
+        dispatched = {}
+        for k in self.offLine_setting.keys(): #backward priority
+            rlt = self.store_setting.get(k)['RLT']
+            dispatched[k] = np.zeros((nBatch,self.SL - rlt))
+            queue = np.rint(retailer_req[k])
+            list_ages = range(self.SL - rlt) if self.issuingPolicy == 'FIFO' else reversed(range(self.SL - rlt))
+            for d in list_ages: # no expired items are sent
+                disp = np.where(queue > 0,np.minimum(queue,availableInv[:,d + rlt]),0) #dispatched of this age
+                dispatched[k][:,d] = np.rint(disp)
+                availableInv[:,d + rlt] -= disp
+                queue -= disp
+        return orderSize,dispatched
+
+    def _paramsBatch(self, obsBatch, X: np.array = None):
+        #(N,dim) parameter vectors of decideBatch
+        nBatch = np.shape(obsBatch['Depot']['inventory'])[0]
+        if X is None:
+            X = np.concatenate([[self.paramsOrder],[self.paramsDispatch[k] for k in self.offLine_setting.keys()],np.asarray(self.paramsOther if len(self.paramsOther) > 0 else [],dtype = float)])
+        else:
+            X = np.asarray(X,dtype = float)
+            if np.any(X > self.ub) or np.any(X < self.lb):
+                raise ValueError('parameters out of boundaries')
+        return np.broadcast_to(X,(nBatch,X.shape[-1]))
+
+    def _orderBatch(self, obsBatch, X: np.array):
+        #(N,SL) orders of the depot
+        depotInv = np.asarray(obsBatch['Depot']['inventory'])
+        nBatch = depotInv.shape[0]
+        ordered = np.asarray(obsBatch['Depot']['ordered']).reshape(nBatch,-1,self.SL)
+        orderSize = np.zeros((nBatch,self.SL))
+        if self.orderPolicy == 'COP':
+            orderSize[:,self.SL-1] = np.rint(X[:,0])
+        if self.orderPolicy == 'BSP':
+            sumRetsInv = 0
+            sumRetsOnO = 0
+            for l in self.offLine_setting.keys():
+                sumRetsInv += np.sum(obsBatch[l]['inventory'],axis = 1)
+                sumRetsOnO += np.sum(np.reshape(obsBatch[l]['dispatched'],(nBatch,-1)),axis = 1)
+            orderSize[:,self.SL-1] = np.rint(np.maximum(X[:,0] - sumRetsInv - sumRetsOnO - np.sum(depotInv,axis = 1) - np.sum(ordered,axis = (1,2)),0))
+        return orderSize
+
+    def _availableBatch(self, obsBatch, X: np.array):
+        #(N,SL) inventory of the depot (arrivals of the day included) that can be dispatched, net of the online reserve
+        depotInv = np.asarray(obsBatch['Depot']['inventory'])
+        ordered = np.asarray(obsBatch['Depot']['ordered']).reshape(depotInv.shape[0],-1,self.SL)
+        availableInv = depotInv.copy()
+        if ordered.shape[1] > 0:
+            availableInv += ordered[:,0]
+        ## if we have a quantity to maintain in the online
+        if self.criticalToServe:
+            criticalToServe = X[:,-1].copy()
+            list_ages_r = reversed(range(self.SL)) if self.issuingPolicy == 'FIFO' else range(self.SL)
+            for d in list_ages_r:
+                disp = np.where(criticalToServe > 0,np.minimum(criticalToServe,availableInv[:,d]),0) #reserved of this age
+                availableInv[:,d] -= disp
+                criticalToServe -= disp
+        return availableInv
+
     def xToParams(self, x:np.array):
         """
         It transforms an array input into params format
@@ -186,4 +273,19 @@ class SingleRetailerDepotPolicy(PolicyMultiEchelon):
             params_oth = x[1+len(self.offLine_setting.keys()):]
         else:
             params_oth = {}
-        return params_ord, params_disp, params_oth
\ No newline at end of file
+        return params_ord, params_disp, params_oth
+
+    def effectiveParams(self, x: np.array):
+        """
+        It returns the parameters as they act on the decisions (a tuple): vectors with the same effective parameters take the same
+        decisions in every state, e.g., to share their evaluations (see EvaluationCache).
+        Levels and reserves are compared with integer quantities and rounded, thus only their rounding matters but for the halves
+        (rounded to even after the comparison). With 2k, the dispatch levels and the weights are kept and the ages are truncated.
+        """
+        x = np.asarray(x,dtype = float)
+        effective = np.where(x - np.floor(x) == 0.5,x,np.rint(x))
+        if self.twoKdispatch:
+            nRet = len(self.offLine_setting.keys())
+            effective[1:1 + 4*nRet] = x[1:1 + 4*nRet]
+            effective[1 + nRet:1 + 4*nRet:3] = np.floor(x[1 + nRet:1 + 4*nRet:3])
+        return tuple(effective.tolist())
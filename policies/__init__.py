@@ -2,10 +2,17 @@ from .PolicyMultiEchelon import PolicyMultiEchelon
 from .PolicySingleEchelon import PolicySingleEchelon
 from .SingleEchCOP_BSP import SingleEchCOP_BSP
 from .SingleRetailerDepot import SingleRetailerDepotPolicy
+from .MultiRetailerDepot import MultiRetailerDepotPolicy
+from .RolloutPolicy import RolloutPolicy
+from .policyFactory import policySpec, buildPolicy
 
 __all__ = [
     "PolicyMultiEchelon",
     "PolicySingleEchelon",
     "SingleEchCOP_BSP",
-    "SingleRetailerDepotPolicy"
+    "SingleRetailerDepotPolicy",
+    "MultiRetailerDepotPolicy",
+    "RolloutPolicy",
+    "policySpec",
+    "buildPolicy"
 ]
\ No newline at end of file
@@ -0,0 +1,67 @@
+"""
+Builders of the example policies of main_example.py
+"""
+from .PolicyMultiEchelon import PolicyMultiEchelon
+from .SingleEchCOP_BSP import SingleEchCOP_BSP
+from .SingleRetailerDepot import SingleRetailerDepotPolicy
+
+def policySpec(pol: str, flagDepot: bool):
+    """
+    It returns the class, the setup (list of (method name, args) calls after the initialization) and example parameters of a policy.
+    Policies available with an independent single echelon network: BSP,COP
+    Policies available with a multi-echelon system with depot: FPL_(l or f), SP_(l or f), FPC_(l or f), SC_(l or f), FPL2K_(l or f)
+    Notice that the parameters are examples not optimized.
+    """
+    if flagDepot:
+        policyClass = SingleRetailerDepotPolicy
+        if pol[:2] == 'SP':
+            x = [300,230]
+            setup = [('setDispatchPolicy',('BSP',))]
+        elif pol[:2] == 'SC':
+            x = [235,290,40]
+            setup = [('setDispatchPolicy',('BSP',)),('setCriticalOnline',())]
+        elif pol[:2] == 'FP':
+            x = [1150,300]
+            setup = [('setOrderPolicy',('BSP',)),('setDispatchPolicy',('BSP',))]
+            if pol[2] == 'C':
+                x = [800,230,30]
+                setup.append(('setCriticalOnline',()))
+            elif pol[2:5] == 'L2K':
+                x = [800,230,1,0.6,1]
+                setup.append(('set2k',()))
+            elif pol[2] == 'L':
+                pass
+            else:
+                raise ValueError('Policy not available')
+        else:
+            raise ValueError('Policy not available')
+        #internal issuing
+        if pol[-1] == 'l':
+            setup.append(('setInnerIssuing',('LIFO',)))
+        elif pol[-1] == 'f':
+            setup.append(('setInnerIssuing',('FIFO',)))
+        else:
+            raise ValueError('Policy not available')
+    else:
+        policyClass = SingleEchCOP_BSP
+        if pol == 'COP':
+            x = [100,100]
+            setup = []
+        elif pol == 'BSP':
+            x = [900,900]
+            setup = [('setBSP',('OnLine',)),('setBSP',('OffLine',))]
+        else:
+            raise ValueError('Policy not available')
+    return policyClass, setup, x
+
+def buildPolicy(policyClass, setup: list, store_setting: dict, producer: dict):
+    """
+    It initializes a policy class (multi or single echelon) and applies the setup calls, e.g., [('setDispatchPolicy',('BSP',))]
+    """
+    if issubclass(policyClass, PolicyMultiEchelon):
+        policy = policyClass(store_setting, producer, {}, {})
+    else:
+        policy = policyClass(store_setting, producer, {})
+    for method,args in setup:
+        getattr(policy, method)(*args)
+    return policy
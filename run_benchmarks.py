@@ -0,0 +1,67 @@
+"""
+Command line tool running the benchmarks of the simulator and writing their records as JSON, e.g.,
+
+python run_benchmarks.py --out bench.json
+python run_benchmarks.py --quick --only throughput scenario --out bench_new.json --compare bench.json
+
+Each record is identified by its benchmark and settings (configuration, policy, horizon, SL, LT, stores); --compare prints the ratio
+of the new and old throughput (or time) of the records found in both files.
+"""
+
+from benchmarks import *
+import argparse
+import json
+import platform
+import subprocess
+import time
+import numpy as np
+
+BENCHMARKS = {'throughput': throughput, 'scenario': scenarioGeneration, 'scaling': scaling, 'stores': stores, 'rollout': rollout, 'evaluation': evaluation}
+
+def recordKey(record: dict):
+    #settings of a record (measures excluded)
+    return tuple((k, record[k]) for k in sorted(record.keys()) if k not in ['seconds','daysPerSecond','storeDaysPerSecond','msPerDecision','profit','baseProfit','steps'])
+
+def gitCommit():
+    try:
+        return subprocess.run(['git','rev-parse','--short','HEAD'], capture_output = True, text = True, check = True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks of the simulator throughput and scaling.')
+    parser.add_argument('--confDir', default = './configurations')
+    parser.add_argument('--only', nargs = '+', choices = list(BENCHMARKS.keys()), default = list(BENCHMARKS.keys()))
+    parser.add_argument('--quick', action = 'store_true', help = 'short horizons (smoke test, noisier figures)')
+    parser.add_argument('--out', default = None, help = 'output JSON file')
+    parser.add_argument('--compare', default = None, help = 'JSON file of a previous run')
+    args = parser.parse_args()
+
+    settings = {'throughput': {'days': 7*2000, 'repeats': 3}, 'scenario': {'horizons': [7*1000, 7*10000, 7*50000]},
+                'scaling': {'days': 7*1000}, 'stores': {'days': 7*500}, 'rollout': {'days': 7*50}, 'evaluation': {'timeHorizon': 7*10000}}
+    if args.quick:
+        settings = {'throughput': {'days': 7*200, 'repeats': 1}, 'scenario': {'horizons': [7*1000, 7*5000], 'repeats': 1},
+                    'scaling': {'days': 7*200, 'repeats': 1}, 'stores': {'counts': [1, 10, 50], 'days': 7*100, 'repeats': 1},
+                    'rollout': {'samples': [8, 32], 'days': 7*30},
+                    'evaluation': {'timeHorizon': 7*1000}}
+    records = []
+    for name in args.only:
+        start = time.perf_counter()
+        records += BENCHMARKS[name](args.confDir, **settings[name])
+        print(name, 'done in', round(time.perf_counter() - start, 1), 's')
+    report = {'commit': gitCommit(), 'date': time.strftime('%Y-%m-%d %H:%M:%S'), 'python': platform.python_version(),
+              'numpy': np.__version__, 'machine': platform.machine(), 'quick': args.quick, 'records': records}
+    for record in records:
+        print(' '.join(str(k) + '=' + (str(round(v, 4)) if isinstance(v, float) else str(v)) for k,v in record.items()))
+    if args.out is not None:
+        with open(args.out, 'w') as fp:
+            json.dump(report, fp, indent = 1)
+    if args.compare is not None:
+        with open(args.compare, 'r') as fp:
+            old = {recordKey(record): record for record in json.load(fp)['records']}
+        print('\nnew/old (throughput, or old/new time; > 1 is faster):')
+        for record in records:
+            previous = old.get(recordKey(record))
+            if previous is not None:
+                ratio = record['daysPerSecond']/previous['daysPerSecond'] if 'daysPerSecond' in record else previous['seconds']/record['seconds']
+                print('\t', ' '.join(str(v) for k,v in recordKey(record)), ':', round(ratio, 3))